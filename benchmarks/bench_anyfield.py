@@ -0,0 +1,244 @@
+""" Benchmarks of SField evaluation compared to hand-written lambdas
+    and ``operator.itemgetter``.
+
+    Run from repository root::
+
+        python benchmarks/bench_anyfield.py --records 100000 --output bench_results.json
+
+    Each case is a group of implementations of the same computation.
+    For each implementation following metrics are reported:
+
+    - throughput (records per second, best of repeats)
+    - per-record latency (nanoseconds, best and median of repeats)
+    - peak memory allocated during single run (measured via tracemalloc,
+      in separate run, to not affect timings)
+    - best latency relative to ``BASELINE`` implementation
+      (``relative_to_baseline`` and ``baseline`` keys of results)
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import operator
+import statistics
+import tracemalloc
+
+# Benchmark code of this repository, even if other version is installed
+SRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+sys.path.insert(0, SRC_DIR)
+import anyfield  # noqa: E402
+
+from anyfield import F, C, SView  # noqa: E402
+
+
+def make_data(size):
+    """ Generate list of records to run benchmarks on
+    """
+    return [{
+        'id': i,
+        'state': 'closed' if i % 3 else 'open',
+        'comments': i % 5,
+        'score': (i * 7) % 100,
+        'title': 'Issue number %d' % i,
+        'label': None if i % 2 else 'bug',
+        'user': {'login': 'user%d' % (i % 100), 'profile': {'meta': {'level': i % 10}}},
+    } for i in range(size)]
+
+
+def consume(fn, data):
+    """ Apply fn to each record of data
+    """
+    for record in data:
+        fn(record)
+
+
+def consume_view(view, data):
+    """ Consume all rows produced by view
+    """
+    for __ in view(data):
+        pass
+
+
+def _view_lambda(data):
+    for r in data:
+        yield [r['id'], r['state'], r['user']['login'], r['title'][:10]]
+
+
+def _view_itemgetter(data):
+    getter = operator.itemgetter('id', 'state', 'user', 'title')
+    for r in data:
+        id_, state, user, title = getter(r)
+        yield [id_, state, user['login'], title[:10]]
+
+
+def _chain(*getters):
+    """ Compose getters, to access nested values without lambdas
+    """
+    def fn(record):
+        for getter in getters:
+            record = getter(record)
+        return record
+    return fn
+
+
+def _with_getter(getter, fn):
+    """ Compute fn on values extracted by itemgetter
+    """
+    return lambda r: fn(*getter(r))
+
+
+_match = [('open', 1), ('closed', 2)]
+_match_dict = dict(_match)
+_get_title = operator.itemgetter('title')
+
+
+def _q_if_cfield_itemgetter(record):
+    title = _get_title(record)
+    return title.upper() if title else 'empty'
+
+
+#: Implementation, that is used as baseline in all cases
+BASELINE = 'lambda'
+
+#: Benchmark cases: name -> list of (implementation name, kind, callable)
+#: kind 'fn' means callable of one record, 'view' means callable of data
+CASES = {
+    'getitem': [
+        ('sfield', 'fn', F['id']._F),
+        ('lambda', 'fn', lambda r: r['id']),
+        ('itemgetter', 'fn', operator.itemgetter('id')),
+    ],
+    'getitem_deep': [
+        ('sfield', 'fn', F['user']['profile']['meta']['level']._F),
+        ('sfield_null_safe', 'fn', anyfield.M['user']['profile']['meta']['level']._F),
+        ('lambda', 'fn', lambda r: r['user']['profile']['meta']['level']),
+        ('itemgetter', 'fn', _chain(*map(operator.itemgetter, ['user', 'profile', 'meta', 'level']))),
+    ],
+    'arithmetic_nested_sfield': [
+        ('sfield', 'fn', (F['score'] * 2 + F['comments'] - F['id'] % 7)._F),
+        ('lambda', 'fn', lambda r: r['score'] * 2 + r['comments'] - r['id'] % 7),
+        ('itemgetter', 'fn', _with_getter(operator.itemgetter('score', 'comments', 'id'),
+                                          lambda s, c, i: s * 2 + c - i % 7)),
+    ],
+    'q_if': [
+        ('sfield', 'fn', F['label'].__q_if__(F['title'], 'no label')._F),
+        ('lambda', 'fn', lambda r: r['title'] if r['label'] else 'no label'),
+        ('itemgetter', 'fn', _with_getter(operator.itemgetter('label', 'title'),
+                                          lambda label, title: title if label else 'no label')),
+    ],
+    'q_if_cfield': [
+        ('sfield', 'fn', F['title'].__q_if__(C.upper(), 'empty')._F),
+        ('lambda', 'fn', lambda r: r['title'].upper() if r['title'] else 'empty'),
+        ('itemgetter', 'fn', _q_if_cfield_itemgetter),
+    ],
+    'q_match': [
+        ('sfield', 'fn', F['state'].__q_match__(_match, default=0)._F),
+        ('lambda', 'fn', lambda r: {'open': 1, 'closed': 2}.get(r['state'], 0)),
+        ('itemgetter', 'fn', _chain(operator.itemgetter('state'), lambda s: _match_dict.get(s, 0))),
+    ],
+    'q_first': [
+        ('sfield', 'fn', F.__q_first__(F['label'], F['user']['login'], default='-')._F),
+        ('lambda', 'fn', lambda r: r['label'] or r['user']['login'] or '-'),
+        ('itemgetter', 'fn', _with_getter(operator.itemgetter('label', 'user'),
+                                          lambda label, user: label or user['login'] or '-')),
+    ],
+    'sview': [
+        ('sview', 'view', SView(F['id'], F['state'], F['user']['login'], F['title'][:10])),
+        ('lambda', 'view', _view_lambda),
+        ('itemgetter', 'view', _view_itemgetter),
+    ],
+}
+
+
+def run_once(kind, impl, data):
+    """ Run implementation once over data
+
+        :return: time spent in seconds
+    """
+    start = time.perf_counter()
+    if kind == 'view':
+        consume_view(impl, data)
+    else:
+        consume(impl, data)
+    return time.perf_counter() - start
+
+
+def measure_memory(kind, impl, data):
+    """ Measure peak memory allocated during single run
+
+        :return: peak memory in bytes
+    """
+    tracemalloc.start()
+    try:
+        run_once(kind, impl, data)
+        __, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def run_case(name, implementations, data, repeat):
+    """ Run all implementations of single benchmark case
+    """
+    results = []
+    for impl_name, kind, impl in implementations:
+        run_once(kind, impl, data)  # warm up
+        timings = [run_once(kind, impl, data) for __ in range(repeat)]
+        best = min(timings)
+        results.append({
+            'case': name,
+            'implementation': impl_name,
+            'records': len(data),
+            'repeat': repeat,
+            'throughput': len(data) / best if best else None,
+            'latency_ns_best': best / len(data) * 1e9,
+            'latency_ns_median': statistics.median(timings) / len(data) * 1e9,
+            'peak_memory_bytes': measure_memory(kind, impl, data),
+        })
+    baseline = next(r['latency_ns_best'] for r in results if r['implementation'] == BASELINE)
+    for result in results:
+        result['baseline'] = BASELINE
+        result['relative_to_baseline'] = result['latency_ns_best'] / baseline
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=100000,
+                        help="Number of records to process in each run")
+    parser.add_argument('--repeat', type=int, default=5,
+                        help="Number of timed runs of each implementation")
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help="Run only specified cases. Could be repeated.")
+    parser.add_argument('--output', help="Path to JSON file to save results to")
+    args = parser.parse_args(argv)
+
+    print("anyfield %s from %s" % (anyfield.__version__, anyfield.__file__))
+    data = make_data(args.records)
+    results = []
+    for name in (args.case or list(CASES)):
+        for result in run_case(name, CASES[name], data, args.repeat):
+            results.append(result)
+            print("%-26s %-18s %12.0f rec/s %10.1f ns/rec %10.1f KiB" % (
+                result['case'], result['implementation'], result['throughput'],
+                result['latency_ns_best'], result['peak_memory_bytes'] / 1024.0))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'anyfield_version': anyfield.__version__,
+                'anyfield_file': anyfield.__file__,
+                'python': platform.python_version(),
+                'implementation': platform.python_implementation(),
+                'platform': platform.platform(),
+                'timestamp': time.time(),
+                'records': args.records,
+                'repeat': args.repeat,
+                'results': results,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
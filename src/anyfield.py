@@ -42,9 +42,31 @@ Will result in::
 
 """
 
+import io
+import os
+import time
+import datetime
+import decimal
+import fractions
+import csv
+import copy
+import json
+import itertools
+import heapq
+import math
+import mmap
+import array
 import types
+import pickle
+import marshal
+import tempfile
+import random
+import hashlib
 import operator
 import logging
+import weakref
+import collections
+import collections.abc
 
 _logger = logging.getLogger(__name__)
 
@@ -57,8 +79,36 @@ __all__ = (
     'CF',
     'F',
     'C',
+    'MF',
+    'M',
+    'Missing',
     'toFn',
     'toSField',
+    'SViewErrors',
+    'RecordCache',
+    'ColumnCache',
+    'SharedColumns',
+    'ShardFiles',
+    'Aggregate',
+    'Count',
+    'Sum',
+    'Mean',
+    'Min',
+    'Max',
+    'DistinctCount',
+    'Quantiles',
+    'TopK',
+    'Frequencies',
+    'HyperLogLog',
+    'KLLSketch',
+    'CountMinSketch',
+    'SpaceSaving',
+    'BloomFilter',
+    'ScalableBloomFilter',
+    'MaterializedView',
+    'Window',
+    'FollowJSONL',
+    'aggregate',
 )
 
 
@@ -129,13 +179,82 @@ class PlaceHolderClass:
 PlaceHolder = PlaceHolderClass()
 
 
+class MissingClass:
+    """ Simple class to represent absent value.
+        Used as marker of missing key / attribute in null-safe expressions,
+        and as default value of *missing* argument,
+        that means that expression is not null-safe.
+    """
+    inst = None
+
+    def __new__(cls):
+        if cls.inst is None:
+            cls.inst = super(MissingClass, cls).__new__(cls)
+        return cls.inst
+
+    def __bool__(self):
+        return False
+
+    def __str__(self):
+        return "Missing"
+
+    def __repr__(self):
+        return "<Missing>"
+
+
+Missing = MissingClass()
+
+
+def _safe_getitem(obj, key):
+    """ Null-safe version of ``operator.getitem``.
+        Checks presence of key instead of catching exceptions where possible.
+
+        :return: obj[key] or Missing if there is no such key in obj
+    """
+    if obj is None:
+        return Missing
+    if type(obj) is dict:
+        try:
+            return obj.get(key, Missing)
+        except TypeError:
+            # Unhashable key
+            return Missing
+    if isinstance(obj, dict) and hasattr(type(obj), '__missing__'):
+        # defaultdict, Counter, etc: absent keys are handled
+        # by __missing__, same as in non null-safe mode
+        try:
+            return obj[key]
+        except (KeyError, TypeError):
+            return Missing
+    if isinstance(obj, collections.abc.Mapping):
+        return obj[key] if key in obj else Missing
+    if isinstance(key, int) and isinstance(obj, collections.abc.Sequence):
+        size = len(obj)
+        return obj[key] if -size <= key < size else Missing
+    try:
+        return obj[key]
+    except (KeyError, IndexError, TypeError):
+        return Missing
+
+
+def _safe_getattr(obj, name, *args):
+    """ Null-safe version of ``getattr``.
+
+        :return: value of attribute or Missing if there is no such attribute
+    """
+    if obj is None:
+        return Missing
+    return getattr(obj, name, *(args or (Missing,)))
+
+
 class ComputeState:
     """ Simple class to handle state of computation of SField.
         Instances of this class contains original value and current value.
     """
-    def __init__(self, value):
+    def __init__(self, value, missing=Missing):
         self._orig_val = value
         self._curr_val = value
+        self._missing = missing
 
     @property
     def orig(self):
@@ -155,18 +274,25 @@ class ComputeState:
         """
         self._curr_val = value
 
+    @property
+    def missing(self):
+        """ Value returned for missing keys / attributes,
+            or Missing if computation is not null-safe.
+        """
+        return self._missing
+
     def resolve(self, arg):
         """ Resolve value. Handle SField, CField.
         """
         # If argument is CField instance, then we have to compute it
         # based on current value, instead of original value
         if isinstance(arg, CField):
-            return arg.__calculate__(self.curr)
+            return arg.__sf_evaluate__(self.curr, self.missing)
 
         # If argument is SField, then let's try to process it by ourselfs
         # thus operator function will work with already computed value
         if isinstance(arg, SField):
-            return arg.__calculate__(self.orig)
+            return arg.__sf_evaluate__(self.orig, self.missing)
 
         return arg
 
@@ -393,8 +519,26 @@ class SField(metaclass=SFieldMeta):
             >>> F.__q_not__()._F(False)
             True
 
+        Null-safe expressions (built with ``missing`` argument, or from
+        ``M`` shortcut) do not raise errors on missing keys or attributes.
+        Instead, presence of each key / attribute is checked, and if
+        any link of the path is missing, the value of ``missing`` is returned:
+
+            >>> data = {'user': {'login': 'john'}}
+            >>> M['user']['login']._F(data)
+            'john'
+            >>> M['owner']['login']._F(data) is None
+            True
+            >>> M['user'].email._F(data) is None
+            True
+            >>> SField(dummy=True, missing='-')['owner']['login']._F(data)
+            '-'
+
         :param str name: name of field
         :param bool dummy: if set to True, on next operation new SField instance will be created
+        :param missing: if passed, then expression becomes null-safe:
+                        this value will be returned if some key or attribute
+                        on the path is missing.
 
     """
 
@@ -404,12 +548,19 @@ class SField(metaclass=SFieldMeta):
         '_ipython_canary_method_should_not_exist_',  # ipython check for 'have everything' object
         '_ipython_display_',                         # attempt to show rich representation for SField instance. it heve no one
         '__wrapped__',                               # make recursion in inspect.unwrap method. first seen, by attempting to run doctests
+        '__deepcopy__',                              # copy.deepcopy looks it up on instance
     )
 
-    def __init__(self, name=None, dummy=False):
+    # Frozen instances are not changed by operations, instead
+    # new SField is created for each operation (see __sf_intern__)
+    __sf_frozen__ = False
+
+    def __init__(self, name=None, dummy=False, missing=Missing):
         self.__sf_stack__ = []  # operation stack
         self.__sf_dummy__ = dummy  # TODO: do we need this
         self.__sf_name__ = name
+        self.__sf_missing__ = missing  # Missing means not null-safe
+        self.__sf_plan_cache__ = None  # compiled plan of this expression
 
     def __apply_fn__(self, fn, *args, **kwargs):
         """ Adds ability to apply specified function to record in expression.
@@ -439,57 +590,138 @@ class SField(metaclass=SFieldMeta):
             "__apply_fn__ called with args (fn: %s, args: %s, kwargs: %s)",
             fn, args, kwargs)
 
-        obj = self if self.__sf_dummy__ is False else self.__class__(dummy=False)
+        if self.__sf_frozen__:
+            obj = self.__sf_copy__()
+        elif self.__sf_dummy__ is False:
+            obj = self
+        else:
+            obj = self.__class__(dummy=False, missing=self.__sf_missing__)
         obj.__sf_stack__.append((fn, [PlaceHolder] + list(args), kwargs))
         return obj
 
     def __calculate__(self, record):
         """ Do final calculation of this SField instances for specified record
         """
-        state = ComputeState(record)
+        return self.__sf_evaluate__(record, self.__sf_missing__)
 
-        def process_arg(op, arg):
-            """ Simple function to process arguments
-            """
-            if arg is PlaceHolder:
-                # If Operator supports handling compute state,
-                # then we just pass state to op function.
-                # Otherwise we pass current value
-                if getattr(op, '__anyfield_handle_state__', False):
-                    return state
-                return state.curr
-
-            # If operator func handle sfield arguments itself, we do not
-            # evaluate SField, operator (op) will evaluate it by itself
-            # (if needed)
-            if getattr(op, '__anyfield_handle_sfield__', False):
-                return arg
-
-            # If argument is CField instance, then we have to compute it
-            # based on current value, instead of original value
-            if isinstance(arg, CField):
-                return arg.__calculate__(state.curr)
-
-            # If argument is SField, then let's try to process it by ourselfs
-            # thus operator function will work with already computed value
-            if isinstance(arg, SField):
-                return arg.__calculate__(state.orig)
-
-            # Return arg unprocessed
-            return arg
+    def __sf_evaluate__(self, record, missing=Missing):
+        """ Calculate this SField instance for specified record.
+
+            :param record: record to compute expression for
+            :param missing: value to return if some key or attribute is
+                            missing on the path. Used only if this field
+                            has no own *missing* value.
+                            Nested fields inherit this value.
+        """
+        plan = self.__sf_plan_cache__
+        if plan is None or plan.size != len(self.__sf_stack__):
+            plan = self.__sf_plan_cache__ = SFieldPlan(self)
+        return plan.evaluate(record, missing)
+
+    def __sf_fingerprint__(self):
+        """ Compute structural fingerprint of this expression.
+
+            SField overloads ``==`` operator, thus expressions cannot be
+            compared directly. Fingerprint is hashable value, that is equal
+            for expressions built in same way, so it could be used
+            as key of dictionary::
+
+                >>> (F['a'] + 5).__sf_fingerprint__() == (F['a'] + 5).__sf_fingerprint__()
+                True
+                >>> (F['a'] + 5).__sf_fingerprint__() == (F['a'] + 6).__sf_fingerprint__()
+                False
+
+            Note, that functions used in expression are compared by identity.
+
+            :return: hashable fingerprint of expression
+        """
+        return (
+            type(self),
+            _fingerprint_value(self.__sf_missing__),
+            tuple((
+                _fingerprint_value(op),
+                tuple(_fingerprint_value(a) for a in args),
+                frozenset((k, _fingerprint_value(v)) for k, v in kwargs.items()),
+            ) for op, args, kwargs in self.__sf_stack__),
+        )
+
+    def __sf_digest__(self):
+        """ Compute digest of this expression, that is stable between
+            processes and runs (in contrast to ``__sf_fingerprint__``).
+            Useful to build persistent cache keys.
+
+            Functions used in expression are represented by their
+            qualified names and bytecode.
+
+            :raises ValueError: if expression contains values that cannot be
+                                represented in stable way
+                                (for example arbitrary objects)
+            :return: hex string
+        """
+        token = _stable_token(self.__sf_fingerprint__())
+        return hashlib.blake2b(token.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+    def __sf_intern__(self):
+        """ Return canonical instance of this expression.
+
+            Equivalent expressions (with same fingerprint) are resolved
+            to the same object, while it is alive::
+
+                >>> e1 = (F['a'] + 5).__sf_intern__()
+                >>> e2 = (F['a'] + 5).__sf_intern__()
+                >>> e1 is e2
+                True
+
+            Canonical instance is frozen copy of expression, so further
+            operations on it (or on this expression) produce new expressions
+            and do not change canonical instance::
+
+                >>> e = F['a']
+                >>> e1 = e.__sf_intern__()
+                >>> e2 = e1 + 5
+                >>> e3 = e + 1
+                >>> F['a'].__sf_intern__()._F({'a': 1})
+                1
+                >>> e2._F({'a': 1}), e3._F({'a': 1})
+                (6, 2)
+        """
+        fingerprint = self.__sf_fingerprint__()
+        field = _INTERNED_FIELDS.get(fingerprint)
+        if field is None:
+            field = _INTERNED_FIELDS.setdefault(fingerprint, _frozen_copy(self))
+        return field
+
+    def __sf_copy__(self):
+        """ Return non-dummy copy of this expression with own stack
+        """
+        obj = self.__class__(name=self.__sf_name__, missing=self.__sf_missing__)
+        obj.__sf_stack__ = list(self.__sf_stack__)
+        return obj
+
+    def __sf_compile__(self):
+        """ Return compiled plan for this expression.
 
-        for op, args, kwargs in self.__sf_stack__:
-            # process arguments
-            args = tuple((process_arg(op, arg) for arg in args))
-            kwargs = {key: process_arg(op, kwargs[key]) for key in kwargs}
+            Plans are cached process-wide by fingerprint of expression,
+            thus equivalent expressions built in different places
+            share same compiled plan::
 
-            _logger.debug(
-                "calc %s iter (op: %s, args: %s, kwargs: %s)",
-                self, op, args, kwargs)
+                >>> plan = (F['a'] + 5).__sf_compile__()
+                >>> plan is (F['a'] + 5).__sf_compile__()
+                True
+                >>> plan({'a': 3})
+                8
 
-            # do operation
-            state.curr = op(*args, **kwargs)
-        return state.curr
+            :rtype: SFieldPlan
+        """
+        fingerprint = self.__sf_fingerprint__()
+        plan = _PLAN_CACHE.get(fingerprint)
+        if plan is None:
+            plan = _PLAN_CACHE[fingerprint] = SFieldPlan(self.__sf_intern__())
+            if len(_PLAN_CACHE) > PLAN_CACHE_SIZE:
+                _PLAN_CACHE.popitem(last=False)
+        else:
+            _PLAN_CACHE.move_to_end(fingerprint)
+        return plan
 
     # Shortcut methods
     def _F(self, record):
@@ -526,8 +758,20 @@ class SField(metaclass=SFieldMeta):
         # methods
         if name in self.__sf_not_supported_attributes__:
             raise AttributeError("This attribute name is not supported by SField instances")
+        # Internal attributes may be missing on instances, that are
+        # not initialized yet (for example during unpickling)
+        if name.startswith('__sf_'):
+            raise AttributeError(name)
         return self.__apply_fn__(getattr, name)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['__sf_plan_cache__'] = None  # plan will be rebuilt on demand
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
 
 class CField(SField):
     """ Same as SField, but could be used in SField expressions to compute
@@ -549,6 +793,226 @@ class CField(SField):
         return name
 
 
+#: Max number of compiled plans to keep in process-wide plan cache
+PLAN_CACHE_SIZE = 1024
+
+# Process-wide cache of compiled plans: fingerprint -> SFieldPlan
+_PLAN_CACHE = collections.OrderedDict()
+
+# Canonical instances of expressions: fingerprint -> SField
+_INTERNED_FIELDS = weakref.WeakValueDictionary()
+
+
+def _frozen_copy(value):
+    """ Copy value used in SField expression, so it cannot be changed
+        by the code, that built expression. SField instances
+        (including nested ones) are copied and frozen,
+        containers are copied recursively.
+    """
+    if isinstance(value, SField):
+        obj = value.__class__(name=value.__sf_name__, missing=value.__sf_missing__)
+        obj.__sf_stack__ = [
+            (op, [_frozen_copy(a) for a in args],
+             {k: _frozen_copy(v) for k, v in kwargs.items()})
+            for op, args, kwargs in value.__sf_stack__]
+        obj.__sf_frozen__ = True
+        return obj
+    if type(value) in (list, tuple, set, frozenset):
+        return type(value)(_frozen_copy(v) for v in value)
+    if type(value) is dict:
+        return {k: _frozen_copy(v) for k, v in value.items()}
+    return value
+
+
+def _fingerprint_value(value):
+    """ Compute hashable fingerprint of value used in SField expression
+    """
+    if isinstance(value, SField):
+        return value.__sf_fingerprint__()
+    if value is PlaceHolder or value is Missing:
+        return value
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_fingerprint_value(v) for v in value))
+    if isinstance(value, dict):
+        return (type(value), frozenset(
+            (_fingerprint_value(k), _fingerprint_value(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return (type(value), frozenset(_fingerprint_value(v) for v in value))
+    if isinstance(value, slice):
+        return (slice, _fingerprint_value(value.start),
+                _fingerprint_value(value.stop), _fingerprint_value(value.step))
+    try:
+        hash(value)
+    except TypeError:
+        # Unhashable values could be compared only by identity
+        return _IdentityKey((type(value), id(value)))
+    # Include type, to distinguish values like 1, 1.0 and True
+    return (type(value), value)
+
+
+class _IdentityKey(tuple):
+    """ Fingerprint of value, that could be compared only by identity
+    """
+
+
+def _stable_token(value):
+    """ Convert fingerprint of expression to string,
+        that is stable between processes and runs.
+
+        Functions are represented by their qualified names and bytecode.
+
+        :raises ValueError: if value cannot be represented in stable way
+    """
+    if value is PlaceHolder:
+        return 'P'
+    if value is Missing:
+        return 'M'
+    if isinstance(value, _IdentityKey):
+        raise ValueError("Cannot compute stable token for %r" % (value[0],))
+    if isinstance(value, tuple):
+        return '(%s)' % ','.join(_stable_token(v) for v in value)
+    if isinstance(value, frozenset):
+        # Order of items of set may differ between processes
+        return '{%s}' % ','.join(sorted(_stable_token(v) for v in value))
+    if value is None or isinstance(value, (str, bytes, int, float, complex)):
+        return repr(value)
+    if isinstance(value, type):
+        return 'T%s.%s' % (value.__module__, value.__qualname__)
+    if isinstance(value, types.FunctionType):
+        code = hashlib.blake2b(marshal.dumps(value.__code__), digest_size=16).hexdigest()
+        return 'F%s.%s:%s(%s,%s)' % (
+            value.__module__, value.__qualname__, code,
+            _stable_token(tuple(
+                _fingerprint_value(c.cell_contents) for c in value.__closure__ or ())),
+            _stable_token(_fingerprint_value(value.__defaults__)))
+    if isinstance(value, types.BuiltinFunctionType) and (
+            value.__self__ is None or isinstance(value.__self__, types.ModuleType)):
+        return 'B%s.%s' % (value.__module__, value.__qualname__)
+    if isinstance(value, slice):
+        return 'S(%s)' % _stable_token((value.start, value.stop, value.step))
+    raise ValueError("Cannot compute stable token for %r" % (value,))
+
+
+# Kinds of arguments of operations in compiled plan
+ARG_CURR = 0     # current value
+ARG_STATE = 1    # compute state
+ARG_CONST = 2    # argument passed as is
+ARG_SFIELD = 3   # SField computed based on original record
+ARG_CFIELD = 4   # CField computed based on current value
+
+
+class SFieldPlan(object):
+    """ Compiled form of SField expression.
+
+        Analysis of each operation of expression (how to pass arguments,
+        which operations have to be null-safe) is done once on compilation,
+        instead of doing it for each record.
+
+        Plan is computed for snapshot of expression's stack.
+
+        :param SField field: expression to compile
+    """
+
+    def __init__(self, field):
+        self.missing = field.__sf_missing__
+        self.size = len(field.__sf_stack__)
+        self.steps = steps = []
+        for op, args, kwargs in field.__sf_stack__:
+            handle_state = getattr(op, '__anyfield_handle_state__', False)
+            handle_sfield = getattr(op, '__anyfield_handle_sfield__', False)
+
+            def arg_kind(arg):
+                if arg is PlaceHolder:
+                    return ARG_STATE if handle_state else ARG_CURR
+                if handle_sfield:
+                    return ARG_CONST
+                if isinstance(arg, CField):
+                    return ARG_CFIELD
+                if isinstance(arg, SField):
+                    return ARG_SFIELD
+                return ARG_CONST
+
+            if op is operator.getitem:
+                safe_op = _safe_getitem
+            elif op is getattr:
+                safe_op = _safe_getattr
+            else:
+                safe_op = None
+
+            arg_kinds = tuple((arg_kind(a), a) for a in args)
+            kwarg_kinds = tuple((k, arg_kind(v), v) for k, v in kwargs.items())
+
+            # Most of operations just take current value as first argument
+            # and constants as other arguments. Such operations
+            # are computed in simplified way.
+            if (arg_kinds and arg_kinds[0][0] == ARG_CURR and not kwarg_kinds and
+                    all(kind == ARG_CONST for kind, __ in arg_kinds[1:])):
+                const_args = tuple(a for __, a in arg_kinds[1:])
+            else:
+                const_args = None
+
+            steps.append((op, safe_op, const_args, arg_kinds, kwarg_kinds))
+
+    def evaluate(self, record, missing=Missing):
+        """ Compute expression for specified record
+
+            :param record: record to compute expression for
+            :param missing: value for missing keys / attributes,
+                            if expression has no own *missing* value.
+        """
+        if self.missing is not Missing:
+            missing = self.missing
+        null_safe = missing is not Missing
+        debug = _logger.isEnabledFor(logging.DEBUG)
+        state = None
+        curr = record
+
+        for op, safe_op, const_args, arg_kinds, kwarg_kinds in self.steps:
+            if null_safe and safe_op is not None:
+                op = safe_op
+
+            if const_args is not None:
+                if debug:
+                    _logger.debug(
+                        "calc %s iter (op: %s, args: %s)",
+                        self, op, (curr,) + const_args)
+                value = op(curr, *const_args)
+            else:
+                if state is None:
+                    state = ComputeState(record, missing)
+                state.curr = curr
+                args = tuple(self._resolve(state, kind, arg) for kind, arg in arg_kinds)
+                kwargs = {key: self._resolve(state, kind, arg) for key, kind, arg in kwarg_kinds}
+                if debug:
+                    _logger.debug(
+                        "calc %s iter (op: %s, args: %s, kwargs: %s)",
+                        self, op, args, kwargs)
+                value = op(*args, **kwargs)
+
+            # Some link of the path is missing, so there is no sense
+            # to continue computation
+            if null_safe and value is Missing:
+                return missing
+            curr = value
+        return curr
+
+    @staticmethod
+    def _resolve(state, kind, arg):
+        if kind == ARG_CURR:
+            return state.curr
+        if kind == ARG_STATE:
+            return state
+        if kind == ARG_CONST:
+            return arg
+        return state.resolve(arg)
+
+    def __call__(self, record):
+        return self.evaluate(record)
+
+    def __repr__(self):
+        return "<SFieldPlan %s>" % self.size
+
+
 def toFn(fn):
     """ Simple wrapper to adapt SField instances to callables,
         that usualy used in .filter(), .sort() and other methods.
@@ -576,6 +1040,27 @@ def toFn(fn):
     return fn
 
 
+def _field_name(field):
+    """ Derive human readable name of SField, or return None
+    """
+    if field.__sf_name__:
+        return u"%s" % field.__sf_name__
+    stack = field.__sf_stack__
+    if len(stack) == 1 and not stack[0][1][1:] and not stack[0][2]:
+        name = getattr(stack[0][0], '__name__', None)
+        if name and name.isidentifier():
+            return name
+    path = []
+    for op, args, kwargs in stack:
+        if op not in (operator.getitem, getattr) or len(args) != 2 or kwargs:
+            return None
+        key = args[1]
+        if isinstance(key, bool) or not isinstance(key, (str, int)):
+            return None
+        path.append(u"%s" % key)
+    return u".".join(path) or None
+
+
 def toSField(field):
     """ Reverse of `toFn`. if field is not SField instance, attempts to convert it to SField
 
@@ -589,6 +1074,931 @@ def toSField(field):
         raise ValueError("Cannot parse field: %r" % field)
 
 
+#: Statistics of RecordCache
+CacheInfo = collections.namedtuple(
+    'CacheInfo', ('hits', 'misses', 'evictions', 'maxsize', 'currsize'))
+
+
+class RecordCache(object):
+    """ Memoization cache of SField expression results per record.
+
+        Useful, when same expensive expression is computed over same
+        long-lived records multiple times (in several views, sorts, etc).
+
+        By default results are keyed by record identity, and cache entries
+        are removed automatically, when record is garbage collected.
+        Thus records must support weak references.
+        For records that do not support weak references (dicts, lists, etc)
+        *key* have to be passed, to compute cache key from record.
+
+        Instances of this class are callables of one argument, so they could be
+        used anywhere, where SField instances are accepted::
+
+            >>> calls = []
+            >>> def expensive(value):
+            ...     calls.append(value)
+            ...     return value * 2
+            >>> data = [{'id': 1, 'v': 5}, {'id': 2, 'v': 7}]
+            >>> cache = RecordCache(F['v']._A(expensive), key=F['id'])
+            >>> list(SView(F['id'], cache)(data))
+            [[1, 10], [2, 14]]
+            >>> sorted(data, key=cache, reverse=True) == data[::-1]
+            True
+            >>> toSField(cache)._F(data[0]) + 1
+            11
+            >>> calls
+            [5, 7]
+            >>> cache.info()
+            CacheInfo(hits=3, misses=2, evictions=0, maxsize=1024, currsize=2)
+
+        :param field: SField instance or callable to compute value for record
+        :param int maxsize: max number of records to keep results for.
+                            Least recently used results are evicted first.
+                            If set to None, cache is unbounded.
+        :param key: SField instance or callable to compute cache key
+                    for record. If not set, record identity is used.
+    """
+
+    def __init__(self, field, maxsize=1024, key=None):
+        self.field = toSField(field)
+        self.maxsize = maxsize
+        self.key = toFn(key) if key is not None else None
+        self._data = collections.OrderedDict()  # key -> (weakref, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, record):
+        data = self._data
+        if self.key is None:
+            key = id(record)
+            entry = data.get(key)
+            if entry is not None and entry[0]() is record:
+                self.hits += 1
+                data.move_to_end(key)
+                return entry[1]
+
+            def remove(ref, key=key, data=data):
+                # Record is garbage collected, so clean up its entry
+                current = data.get(key)
+                if current is not None and current[0] is ref:
+                    del data[key]
+
+            try:
+                ref = weakref.ref(record, remove)
+            except TypeError:
+                raise TypeError(
+                    "Cannot cache results by identity of %s records, "
+                    "because they do not support weak references. "
+                    "Use 'key' argument." % type(record).__name__)
+        else:
+            key = self.key(record)
+            entry = data.get(key)
+            if entry is not None:
+                self.hits += 1
+                data.move_to_end(key)
+                return entry[1]
+            ref = None
+
+        self.misses += 1
+        value = self.field.__calculate__(record)
+        data[key] = (ref, value)
+        if self.maxsize is not None and len(data) > self.maxsize:
+            data.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def info(self):
+        """ Return cache statistics
+
+            :rtype: CacheInfo
+        """
+        return CacheInfo(
+            self.hits, self.misses, self.evictions, self.maxsize, len(self._data))
+
+    def clear(self):
+        """ Clear cache and statistics
+        """
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return "<RecordCache for %s>" % self.field
+
+
+class ColumnCache(object):
+    """ Persistent on-disk cache of computed columns of SView.
+
+        Entries are keyed by stable digest of expression
+        (see ``SField.__sf_digest__``) and identity of input file
+        (path, size, modification time), thus cache is invalidated
+        automatically, when input file changes.
+
+        Numeric columns (all values are int64 or all are float) are stored
+        as raw arrays and loaded as memory-mapped ``memoryview`` objects,
+        without reading whole file in memory. Other columns are
+        stored pickled.
+
+        When total size of cache exceeds *max_size*, least recently used
+        entries are removed.
+
+        See ``SView.columns`` for usage example.
+
+        :param str directory: directory to store cache files in
+        :param int max_size: max total size of cache files in bytes
+    """
+
+    #: Extension of cache files
+    extension = '.afcol'
+
+    # Header of cache file: magic (4 bytes), format (1 byte), padding.
+    # Header is 8 bytes long, to keep array data aligned.
+    _magic = b'AFC1'
+    _header_size = 8
+
+    def __init__(self, directory, max_size=1 << 30):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def source_identity(path):
+        """ Compute identity of input file: (path, size, mtime)
+        """
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    def make_key(self, digest, source):
+        """ Build cache key for expression digest and input file path
+        """
+        token = repr((digest, self.source_identity(source)))
+        return hashlib.blake2b(token.encode('utf-8', 'surrogatepass'), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.extension)
+
+    def get(self, key):
+        """ Load column from cache
+
+            :return: column (memoryview for numeric columns, list otherwise)
+                     or None if there is no such entry in cache
+        """
+        path = self._path(key)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        with f:
+            header = f.read(self._header_size)
+            if len(header) != self._header_size or header[:4] != self._magic:
+                _logger.warning("Invalid column cache file %s", path)
+                return None
+            typecode = header[4:5].decode()
+            if typecode == 'p':
+                column = pickle.load(f)
+            elif f.seek(0, os.SEEK_END) == self._header_size:
+                column = array.array(typecode)
+            else:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                column = memoryview(mapped)[self._header_size:].cast(typecode)
+        os.utime(path)  # mark entry as recently used
+        return column
+
+    def put(self, key, column):
+        """ Save column to cache
+        """
+        typecode = self._numeric_typecode(column)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._magic + (typecode or 'p').encode() + b'\0' * 3)
+                if typecode:
+                    array.array(typecode, column).tofile(f)
+                else:
+                    pickle.dump(list(column), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+
+    @classmethod
+    def as_cached(cls, column):
+        """ Convert column to same form, as it is loaded from cache:
+            typed memoryview for numeric columns, list otherwise
+        """
+        typecode = cls._numeric_typecode(column)
+        if typecode:
+            return memoryview(array.array(typecode, column))
+        return list(column)
+
+    @staticmethod
+    def _numeric_typecode(column):
+        """ Find array typecode to store column, or None if column is not numeric
+        """
+        if not column:
+            return None
+        if all(type(v) is float for v in column):
+            return 'd'
+        if all(type(v) is int and -(1 << 63) <= v < (1 << 63) for v in column):
+            return 'q'
+        return None
+
+    def evict(self):
+        """ Remove least recently used entries, while size of cache
+            is greater than max_size
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for __, size, __ in entries)
+        for __, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """ Remove all entries from cache
+        """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(self.extension):
+                os.unlink(entry.path)
+
+
+class SharedColumns(object):
+    """ Columns computed by ``SView.parallel_columns``.
+
+        Numeric columns are ``memoryview`` objects over shared memory
+        blocks, filled by worker processes directly.
+        Other columns are lists.
+
+        Shared memory is released on ``close`` (or on exit from ``with`` block),
+        so numeric columns must not be used after that.
+    """
+
+    def __init__(self, columns, blocks):
+        self.columns = columns
+        self._blocks = blocks  # shared memory blocks owned by this object
+
+    def __getitem__(self, index):
+        return self.columns[index]
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def close(self):
+        """ Release shared memory
+        """
+        for column in self.columns:
+            if isinstance(column, memoryview):
+                column.release()
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+#: Policies that could be used to handle errors of SView fields
+ON_ERROR_POLICIES = ('raise', 'skip', 'null', 'collect')
+
+
+#: Description of single error collected by SView
+SViewError = collections.namedtuple('SViewError', ('row', 'field', 'error'))
+
+
+class SViewErrors(object):
+    """ Errors collected during single run of SView.
+
+        :param int max_samples: max number of errors to keep as samples.
+                                Errors over this limit are only counted.
+    """
+
+    def __init__(self, max_samples=100):
+        self.max_samples = max_samples
+        self.counts = collections.Counter()  # field index -> number of errors
+        self.samples = []  # list of SViewError
+
+    def add(self, row, field, error, sample=True):
+        """ Register error of *field* (index of field) on *row*
+            (index of record in data)
+        """
+        self.counts[field] += 1
+        if sample and len(self.samples) < self.max_samples:
+            self.samples.append(SViewError(row, field, error))
+
+    @property
+    def total(self):
+        """ Total number of errors
+        """
+        return sum(self.counts.values())
+
+    def __bool__(self):
+        return bool(self.counts)
+
+    def __repr__(self):
+        return "<SViewErrors total=%s, samples=%s>" % (self.total, len(self.samples))
+
+
+def _batches(iterable, size):
+    """ Split iterable on lists of at most *size* items
+    """
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _serialize_csv(rows, fmtparams):
+    """ Serialize batch of rows to CSV text
+    """
+    buf = io.StringIO()
+    csv.writer(buf, **fmtparams).writerows(rows)
+    return buf.getvalue()
+
+
+def _serialize_jsonl(rows, keys, json_params):
+    """ Serialize batch of rows to JSON Lines text
+    """
+    encode = json.JSONEncoder(**json_params).encode
+    if keys is not None:
+        rows = (dict(zip(keys, row)) for row in rows)
+    return ''.join([encode(row) + '\n' for row in rows])
+
+
+def _write_text(path_or_file, chunks, encoding, buffer_size, newline=None):
+    """ Write chunks of text to file (path or file-like object)
+    """
+    if isinstance(path_or_file, (str, bytes, os.PathLike)):
+        with open(path_or_file, 'w', encoding=encoding, newline=newline,
+                  buffering=buffer_size) as f:
+            for chunk in chunks:
+                f.write(chunk)
+    else:
+        for chunk in chunks:
+            path_or_file.write(chunk)
+
+
+def _serialize_batches(batches, serialize, args, executor=None, max_pending=None):
+    """ Serialize batches of rows, possibly in parallel via *executor*
+        (``concurrent.futures.Executor`` instance).
+        Order of batches is preserved.
+    """
+    if executor is None:
+        for batch in batches:
+            yield serialize(batch, *args)
+        return
+
+    max_pending = max_pending or 2 * (getattr(executor, '_max_workers', None) or os.cpu_count() or 1)
+    pending = collections.deque()
+    for batch in batches:
+        pending.append(executor.submit(serialize, batch, *args))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+# State of worker process, used by SView.parallel_columns
+_COLUMN_WORKER = {}
+
+# Typecodes of array module, that could store NaN instead of None
+_FLOAT_TYPECODES = ('f', 'd')
+_NAN = float('nan')
+
+
+def _attach_shared_memory(name):
+    """ Attach to existing shared memory block, owned by parent process
+    """
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no 'track' argument. Worker processes share
+        # resource tracker with parent, so block is registered only once,
+        # and is unregistered when parent unlinks it.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _init_column_worker(view, blocks, dtypes):
+    """ Initialize worker process for SView.parallel_columns
+    """
+    _COLUMN_WORKER['view'] = view
+    _COLUMN_WORKER['dtypes'] = dtypes
+    _COLUMN_WORKER['blocks'] = {
+        index: _attach_shared_memory(name) for index, name in blocks.items()}
+
+
+def _compute_column_chunk(task):
+    """ Compute chunk of columns in worker process.
+        Numeric columns are written directly to shared memory.
+
+        :return: (start, non-numeric columns, errors)
+    """
+    start, records = task
+    view = _COLUMN_WORKER['view']
+    dtypes = _COLUMN_WORKER['dtypes']
+    blocks = _COLUMN_WORKER['blocks']
+
+    rows = list(view(records))
+    if len(rows) != len(records):
+        raise ValueError("View skipped some records, columns cannot be aligned")
+    columns = list(zip(*rows)) if rows else [() for __ in view.fields]
+
+    result = {}
+    for index, column in enumerate(columns):
+        typecode = dtypes.get(index)
+        if typecode is None:
+            result[index] = list(column)
+            continue
+        if None in column:
+            if typecode not in _FLOAT_TYPECODES:
+                raise ValueError(
+                    "Field %d produced None, that cannot be stored "
+                    "in column of type %r" % (index, typecode))
+            column = [_NAN if v is None else v for v in column]
+        data = array.array(typecode, column)
+        offset = start * data.itemsize
+        blocks[index].buf[offset:offset + len(data) * data.itemsize] = memoryview(data).cast('B')
+    return start, result, view.errors
+
+
+#: Min number of bits of Bloom filter. Positions of tiny filters collide
+#: too often, so their false positive rate is much higher than designed.
+BLOOM_MIN_SIZE = 1024
+
+
+def _next_prime(n):
+    """ Return smallest prime number, that is greater or equal to n
+    """
+    n = max(n, 2)
+    while True:
+        if n == 2 or (n % 2 and all(n % d for d in range(3, int(n ** 0.5) + 1, 2))):
+            return n
+        n += 1
+
+
+class BloomFilter(object):
+    """ Bloom filter: set-like structure with fixed memory usage,
+        that may report false positives, but never false negatives.
+
+        Values could be of any type. Note, that values, that are not
+        supported by stable hash (see ``HyperLogLog``), are hashed via
+        builtin ``hash``, so filter with such values is valid only
+        in the process, where it was built.
+
+        :param int capacity: number of values filter is designed for
+        :param float error_rate: false positive probability at *capacity*
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("Capacity must be positive and error_rate must be in range (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        # Prime number of bits spreads positions computed
+        # by double hashing uniformly
+        size = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.hashes = max(1, int(round(size / capacity * math.log(2))))
+        self.size = _next_prime(max(int(math.ceil(size)), BLOOM_MIN_SIZE))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, h):
+        """ Generate positions of bits for value with hash *h*
+        """
+        # Enhanced double hashing (Dillinger, Manolios).
+        # Second hash is derived from first one by splitmix64 finalizer
+        size = self.size
+        g = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) & 0xffffffffffffffff
+        g = ((g ^ (g >> 27)) * 0x94d049bb133111eb) & 0xffffffffffffffff
+        x, y = h % size, (g ^ (g >> 31)) % size
+        for i in range(1, self.hashes + 1):
+            yield x
+            x = (x + y) % size
+            y = (y + i) % size
+
+    def _contains_hash(self, h):
+        bits = self.bits
+        for p in self._positions(h):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def _add_hash(self, h):
+        bits = self.bits
+        added = False
+        for p in self._positions(h):
+            mask = 1 << (p & 7)
+            if not bits[p >> 3] & mask:
+                bits[p >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def __contains__(self, value):
+        return self._contains_hash(_local_hash(value))
+
+    def add(self, value):
+        """ Add value to filter
+
+            :return: True if value was not in filter
+        """
+        return self._add_hash(_local_hash(value))
+
+    def __len__(self):
+        return self.count
+
+
+class ScalableBloomFilter(object):
+    """ Bloom filter, that grows when number of values exceeds capacity,
+        keeping overall false positive probability below *error_rate*.
+
+        Consists of series of Bloom filters with growing capacity and
+        tightening error rate. New filter is added only when previous one
+        is full, thus memory usage is proportional to number of distinct values.
+
+        :param int capacity: capacity of first filter
+        :param float error_rate: max false positive probability
+        :param int growth: capacity multiplier for next filters
+        :param float tightening: error rate multiplier for next filters
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001, growth=2, tightening=0.5):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.growth = growth
+        self.tightening = tightening
+        self.filters = []
+
+    def __contains__(self, value):
+        h = _local_hash(value)
+        return any(f._contains_hash(h) for f in self.filters)
+
+    def add(self, value):
+        """ Add value to filter
+
+            :return: True if value was not in filter
+        """
+        h = _local_hash(value)
+        if any(f._contains_hash(h) for f in self.filters):
+            return False
+        current = self.filters[-1] if self.filters else None
+        if current is None or current.count >= current.capacity:
+            # Error rates of filters sum up to half of error_rate.
+            # Other half is reserved, because actual false positive
+            # rate of filters with few bits exceeds theoretical one.
+            index = len(self.filters)
+            current = BloomFilter(
+                self.capacity * self.growth ** index,
+                self.error_rate * (1 - self.tightening) * self.tightening ** index / 2)
+            self.filters.append(current)
+        current._add_hash(h)
+        return True
+
+    def __len__(self):
+        return sum(len(f) for f in self.filters)
+
+
+class Distinct(object):
+    """ Removes duplicates from stream of records, by key.
+        First record with each key is kept.
+
+        In *exact* mode set of keys is kept in memory (unhashable keys,
+        like dicts and lists, are converted to hashable form).
+        In *bloom* mode scalable Bloom filter is used,
+        thus some unique records may be dropped
+        (with probability about *error_rate*),
+        but memory usage is much lower.
+
+        :param key: SField instance or callable to compute key of record.
+                    If not set, record itself is used as key.
+        :param str mode: 'exact' or 'bloom'
+        :param int capacity: initial capacity of Bloom filter
+        :param float error_rate: false positive probability of Bloom filter
+    """
+
+    def __init__(self, key=None, mode='exact', capacity=100000, error_rate=0.001):
+        if mode not in ('exact', 'bloom'):
+            raise ValueError("Unsupported distinct mode: %r" % mode)
+        self.key = toFn(key) if key is not None else None
+        self.mode = mode
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.dropped = 0
+
+    def __call__(self, records):
+        self.dropped = 0
+        key = self.key
+        if self.mode == 'exact':
+            seen = set()
+
+            def add(value):
+                try:
+                    if value in seen:
+                        return False
+                except TypeError:
+                    value = _hashable_key(value)
+                    if value in seen:
+                        return False
+                seen.add(value)
+                return True
+        else:
+            add = ScalableBloomFilter(self.capacity, self.error_rate).add
+
+        for record in records:
+            if add(record if key is None else key(record)):
+                yield record
+            else:
+                self.dropped += 1
+
+
+class Sample(object):
+    """ Uniform random sample of *n* records from stream of records,
+        computed in single pass via reservoir sampling (Algorithm L).
+
+        If *by* is passed, then separate reservoir is kept for each stratum
+        (value of *by*), thus up to *n* records of each stratum are selected.
+        Memory usage is O(n * number of strata).
+
+        Sampled records are emitted at the end of stream,
+        in their original order.
+
+        :param int n: size of sample (per stratum)
+        :param by: SField instance or callable to compute stratum of record
+        :param seed: seed of random generator, to get reproducible samples
+    """
+
+    def __init__(self, n, by=None, seed=None):
+        if n < 1:
+            raise ValueError("Sample size must be positive")
+        self.n = n
+        self.by = toFn(by) if by is not None else None
+        self.seed = seed
+
+    @staticmethod
+    def _random(rng):
+        """ Random number in range (0, 1)
+        """
+        value = rng.random()
+        while not value:
+            value = rng.random()
+        return value
+
+    def _skip(self, rng, reservoir):
+        """ Compute next weight and position of record to put in reservoir
+        """
+        reservoir[2] *= math.exp(math.log(self._random(rng)) / self.n)
+        reservoir[3] += int(math.log(self._random(rng)) / math.log(1 - reservoir[2])) + 1
+
+    def __call__(self, records):
+        n, by = self.n, self.by
+        rng = random.Random(self.seed)
+        reservoirs = {}  # stratum -> [seen, items, weight, next position]
+
+        for index, record in enumerate(records):
+            stratum = by(record) if by is not None else None
+            reservoir = reservoirs.get(stratum)
+            if reservoir is None:
+                reservoir = reservoirs[stratum] = [0, [], 1.0, 0]
+            reservoir[0] += 1
+            items = reservoir[1]
+            if len(items) < n:
+                items.append((index, record))
+                if len(items) == n:
+                    reservoir[3] = reservoir[0]
+                    self._skip(rng, reservoir)
+            elif reservoir[0] == reservoir[3]:
+                items[rng.randrange(n)] = (index, record)
+                self._skip(rng, reservoir)
+
+        sample = [item for reservoir in reservoirs.values() for item in reservoir[1]]
+        sample.sort(key=operator.itemgetter(0))
+        for __, record in sample:
+            yield record
+
+
+class ShardFiles(object):
+    """ Sink for ``SView.partition``, that writes rows of each shard
+        to separate file.
+
+        File format is CSV, TSV or JSON Lines, determined by *format*
+        or by extension of *template*.
+
+        :param str template: path template with ``{shard}`` placeholder,
+                             for example ``'out/part-{shard:03d}.csv'``
+        :param str format: 'csv', 'tsv' or 'jsonl'
+        :param header: header for CSV files (list of column names)
+        :param keys: keys for JSON Lines (see ``SView.write_jsonl``)
+        :param str encoding: encoding of files
+        :param int buffer_size: size of file buffer
+    """
+
+    def __init__(self, template, format=None, header=None, keys=None,
+                 encoding='utf-8', buffer_size=1 << 16):
+        if format is None:
+            ext = os.path.splitext(template)[1].lower()
+            format = {'.csv': 'csv', '.tsv': 'tsv'}.get(ext, 'jsonl')
+        if format not in ('csv', 'tsv', 'jsonl'):
+            raise ValueError("Unsupported format: %r" % format)
+        self.template = template
+        self.format = format
+        self.header = header
+        self.keys = keys
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        self.files = {}  # shard -> file
+
+    def _open(self, shard):
+        f = self.files.get(shard)
+        if f is None:
+            path = self.template.format(shard=shard)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            f = self.files[shard] = open(
+                path, 'w', encoding=self.encoding,
+                newline='' if self.format != 'jsonl' else None,
+                buffering=self.buffer_size)
+            if self.header and self.format != 'jsonl':
+                f.write(self._serialize([self.header]))
+        return f
+
+    def _serialize(self, rows):
+        if self.format == 'csv':
+            return _serialize_csv(rows, {})
+        if self.format == 'tsv':
+            return _serialize_csv(rows, {'dialect': 'excel-tab'})
+        return _serialize_jsonl(rows, self.keys, {'ensure_ascii': False})
+
+    def __call__(self, shard, rows):
+        self._open(shard).write(self._serialize(rows))
+
+    def close(self):
+        """ Close all files
+        """
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+
+
+class _Descending(object):
+    """ Wrapper for sort key, that inverts order of values.
+        Allows to sort in descending order by non-numeric keys.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    # State is wrapped in tuple, because pickle does not call
+    # __setstate__ for falsy state (for example None or 0)
+    def __getstate__(self):
+        return (self.value,)
+
+    def __setstate__(self, state):
+        self.value, = state
+
+
+class ExternalSort(object):
+    """ Sorts stream of records by SField keys.
+
+        Each key is computed once per record (decorate-sort-undecorate).
+        If *memory_limit* is set, then records are sorted in chunks
+        of bounded size, sorted chunks are spilled to temporary files,
+        and then merged via k-way heap merge. Thus datasets larger than
+        memory could be sorted.
+
+        Sort is stable.
+
+        :param keys: SField instances or callables to compute sort keys
+        :param descending: bool or list of bools (one for each key)
+        :param int memory_limit: approx max size (in bytes) of pickled records
+                                 to keep in memory. If None, then all records
+                                 are sorted in memory.
+        :param str tmpdir: directory for temporary files
+        :param int merge_width: max number of sorted runs to merge at once
+    """
+
+    def __init__(self, *keys, descending=False, memory_limit=None,
+                 tmpdir=None, merge_width=64):
+        if not keys:
+            raise ValueError("At least one sort key is required")
+        self.keys = [toFn(k) for k in keys]
+        if isinstance(descending, bool):
+            descending = [descending] * len(keys)
+        else:
+            descending = list(descending)
+        if len(descending) != len(keys):
+            raise ValueError(
+                "Number of descending flags (%s) does not match "
+                "number of keys (%s)" % (len(descending), len(keys)))
+        self.descending = descending
+        self.memory_limit = memory_limit
+        self.tmpdir = tmpdir
+        self.merge_width = merge_width
+
+    def _decorate(self, records):
+        keys = list(zip(self.keys, self.descending))
+        for seq, record in enumerate(records):
+            yield (tuple(_Descending(k(record)) if desc else k(record)
+                         for k, desc in keys), seq, record)
+
+    def __call__(self, records):
+        if self.memory_limit is None:
+            for __, __, record in sorted(self._decorate(records), key=self._sort_key):
+                yield record
+            return
+
+        runs = []
+        try:
+            chunk, chunk_size = [], 0
+            for item in self._decorate(records):
+                blob = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+                chunk.append((item[0], item[1], blob))
+                chunk_size += len(blob)
+                if chunk_size >= self.memory_limit:
+                    runs.append(self._spill(chunk))
+                    chunk, chunk_size = [], 0
+
+            if not runs:
+                # All records fit in memory
+                chunk.sort(key=self._sort_key)
+                for __, __, blob in chunk:
+                    yield pickle.loads(blob)[2]
+                return
+            if chunk:
+                runs.append(self._spill(chunk))
+            del chunk
+
+            # Merge runs in multiple passes, if there are too many of them
+            while len(runs) > self.merge_width:
+                group, runs = runs[:self.merge_width], runs[self.merge_width:]
+                merged = tempfile.TemporaryFile(dir=self.tmpdir)
+                for item in heapq.merge(*map(self._read_run, group), key=self._sort_key):
+                    pickle.dump(item, merged, protocol=pickle.HIGHEST_PROTOCOL)
+                for run in group:
+                    run.close()
+                merged.seek(0)
+                runs.append(merged)
+
+            for __, __, record in heapq.merge(*map(self._read_run, runs), key=self._sort_key):
+                yield record
+        finally:
+            for run in runs:
+                run.close()
+
+    @staticmethod
+    def _sort_key(item):
+        return item[0], item[1]
+
+    def _spill(self, chunk):
+        """ Sort chunk and write it to temporary file
+        """
+        chunk.sort(key=self._sort_key)
+        run = tempfile.TemporaryFile(dir=self.tmpdir)
+        for __, __, blob in chunk:
+            run.write(blob)
+        run.seek(0)
+        return run
+
+    @staticmethod
+    def _read_run(run):
+        """ Read sorted items from run file
+        """
+        while True:
+            try:
+                yield pickle.load(run)
+            except EOFError:
+                return
+
+
 class SView(object):
     """ Just a simple view to work with SField.
 
@@ -602,13 +2012,72 @@ class SView(object):
             for name, username, umark in view(data):
                 print name, username, umark
 
+        If *missing* is passed, then all fields of view are computed in
+        null-safe mode, thus missing keys or attributes
+        produce *missing* value instead of errors::
+
+            >>> view = SView(F['id'], F['user']['login'], missing=None)
+            >>> list(view([{'id': 1, 'user': {'login': 'john'}}, {'id': 2}]))
+            [[1, 'john'], [2, None]]
+
+        Errors raised by fields could be handled according to *on_error*
+        policy, that could be one of:
+
+        - ``'raise'``: (default) error is propagated, and computation stops
+        - ``'skip'``: rows with errors are skipped
+        - ``'null'``: *error_value* is used as value of failed field
+        - ``'collect'``: same as ``'null'``, but error is saved in samples
+
+        Policy could be set for all fields, or for each field separately.
+        Errors of the last run are available via ``errors`` attribute::
+
+            >>> view = SView(F['id'], F['value'] * 2, on_error=['raise', 'collect'])
+            >>> list(view([{'id': 1, 'value': 4}, {'id': 2}, {'id': 3, 'value': 1}]))
+            [[1, 8], [2, None], [3, 2]]
+            >>> view.errors.counts[1]
+            1
+            >>> view.errors.samples[0].row
+            1
+
+        :param fields: SField instances or callables of one argument
+        :param missing: if passed, then fields will be computed in null-safe mode
+                        and this value will be used for missing keys / attributes.
+        :param on_error: policy to handle field errors,
+                         or list of policies, one for each field.
+        :param error_value: value used for failed fields with
+                            'null' or 'collect' policies
+        :param int max_error_samples: max number of errors to keep
+                                      in ``errors.samples``
     """
 
-    def __init__(self, *fields):
+    def __init__(self, *fields, missing=Missing, on_error='raise',
+                 error_value=None, max_error_samples=100):
         self.fields = []
         for f in fields:
             assert isinstance(f, SField) or callable(f), "Each field must be callable or instance of SField"
             self.fields.append(toSField(f))
+        self.missing = missing
+
+        if isinstance(on_error, str):
+            on_error = [on_error] * len(self.fields)
+        else:
+            on_error = list(on_error)
+        if len(on_error) != len(self.fields):
+            raise ValueError(
+                "Number of on_error policies (%s) does not match "
+                "number of fields (%s)" % (len(on_error), len(self.fields)))
+        for policy in on_error:
+            if policy not in ON_ERROR_POLICIES:
+                raise ValueError("Unsupported on_error policy: %r" % policy)
+        self.on_error = on_error
+        self.error_value = error_value
+        self.max_error_samples = max_error_samples
+        self.errors = SViewErrors(max_error_samples)
+
+        # Transformations of stream of records, applied before
+        # computation of fields. Each stage is callable,
+        # that takes iterable of records and returns iterable of records.
+        self.stages = []
 
     @property
     def headers(self):
@@ -616,9 +2085,1707 @@ class SView(object):
         """
         return [u"%s" % f for f in self.fields]
 
+    @property
+    def column_names(self):
+        """ Names of columns, derived from fields of view.
+
+            Name of field is its *name* (if set), path of keys
+            and attributes (for expressions like ``F['user']['login']``),
+            or name of function. Other fields are named ``field<N>``::
+
+                >>> SView(F['id'], F['user'].login, F['id'] * 2, len).column_names
+                ['id', 'user.login', 'field3', 'len']
+        """
+        names = []
+        for index, field in enumerate(self.fields):
+            name = _field_name(field) or 'field%d' % (index + 1)
+            while name in names:
+                name += '_%d' % (index + 1)
+            names.append(name)
+        return names
+
+    def _with_stage(self, stage):
+        """ Return copy of this view with extra stage added
+        """
+        view = copy.copy(self)
+        view.stages = self.stages + [stage]
+        view.errors = SViewErrors(self.max_error_samples)
+        return view
+
+    def sort_by(self, *keys, descending=False, memory_limit=None, tmpdir=None):
+        """ Return new view, that produces rows sorted by specified keys.
+
+            Keys are computed for records (not for rows of view)
+            once per record. Descending order is supported for keys of
+            any comparable type::
+
+                >>> data = [{'name': n, 'age': a} for n, a in [
+                ...     ('bob', 30), ('ann', 25), ('john', 30), ('kate', 25)]]
+                >>> view = SView(F['name']).sort_by(F['age'], F['name'], descending=[False, True])
+                >>> list(view(data))
+                [['kate'], ['ann'], ['john'], ['bob']]
+
+            If *memory_limit* is set, then data is sorted in bounded chunks,
+            spilled to temporary files and merged (external merge sort).
+            See ``ExternalSort`` for details.
+
+            :param keys: SField instances or callables to compute sort keys
+            :param descending: bool or list of bools (one for each key)
+            :param int memory_limit: approx max size of data in bytes
+                                     to keep in memory
+            :param str tmpdir: directory for temporary files
+            :rtype: SView
+        """
+        return self._with_stage(ExternalSort(
+            *keys, descending=descending, memory_limit=memory_limit, tmpdir=tmpdir))
+
+    def distinct(self, key=None, mode='exact', capacity=100000, error_rate=0.001):
+        """ Return new view, that skips records with duplicate keys.
+
+            For example::
+
+                >>> data = [{'id': 1, 'v': 'a'}, {'id': 2, 'v': 'b'}, {'id': 1, 'v': 'c'}]
+                >>> list(SView(F['v']).distinct(key=F['id'])(data))
+                [['a'], ['b']]
+
+            See ``Distinct`` for details.
+
+            :param key: SField instance or callable to compute key of record
+            :param str mode: 'exact' (keep set of key hashes) or
+                             'bloom' (use scalable Bloom filter)
+            :param int capacity: initial capacity of Bloom filter
+            :param float error_rate: false positive probability of Bloom filter
+            :rtype: SView
+        """
+        return self._with_stage(Distinct(key, mode, capacity, error_rate))
+
+    def sample(self, n, by=None, seed=None):
+        """ Return new view, that produces rows only for random sample
+            of *n* records (or *n* records of each stratum, if *by* is passed).
+
+            Sample is computed in single pass (reservoir sampling)::
+
+                >>> data = [{'id': i, 'country': 'UA' if i % 3 else 'PL'} for i in range(100)]
+                >>> rows = list(SView(F['country']).sample(2, by=F['country'], seed=42)(data))
+                >>> sorted(rows)
+                [['PL'], ['PL'], ['UA'], ['UA']]
+
+            See ``Sample`` for details.
+
+            :param int n: size of sample (per stratum)
+            :param by: SField instance or callable to compute stratum of record
+            :param seed: seed of random generator, to get reproducible samples
+            :rtype: SView
+        """
+        return self._with_stage(Sample(n, by=by, seed=seed))
+
+    def window(self, ts, size, slide=None, aggregates=None, group_by=None,
+               allowed_lateness=None, origin=None):
+        """ Return callable, that computes aggregates over time windows
+            of stream of records (after stages of this view).
+
+            Results of each window are emitted as soon as watermark
+            (max seen timestamp minus *allowed_lateness*) passes end of window,
+            thus only state of open windows is kept in memory::
+
+                >>> data = [{'ts': t, 'v': v} for t, v in [
+                ...     (0, 1), (5, 2), (10, 3), (12, 4), (25, 5)]]
+                >>> windows = SView().window(F['ts'], size=10, aggregates={'sum': Sum(F['v'])})
+                >>> for w in windows(data):
+                ...     print(w.start, w.end, w.results)
+                0 10 {'sum': 3}
+                10 20 {'sum': 7}
+                20 30 {'sum': 5}
+
+            See ``Window`` for details.
+
+            :param ts: SField instance or callable to compute timestamp of record
+            :param size: size of window
+            :param slide: step between starts of windows.
+                          If not set, then tumbling windows (slide = size) are used.
+            :param dict aggregates: mapping {name: Aggregate}.
+                                    By default only count of records is computed.
+            :param group_by: SField instance or callable to compute group of record
+            :param allowed_lateness: how long to wait for late records
+            :param origin: start of first window
+            :return: callable, that takes data and yields ``WindowResult``
+        """
+        windows = Window(ts, size, slide=slide, aggregates=aggregates, group_by=group_by,
+                         allowed_lateness=allowed_lateness, origin=origin)
+        if not self.stages:
+            return windows
+        return lambda data: windows(self._apply_stages(data))
+
+    def _apply_stages(self, data):
+        """ Apply stages of view to stream of records
+        """
+        for stage in self.stages:
+            data = stage(data)
+        return data
+
     def __call__(self, data):
-        for record in data:
-            yield [f.__calculate__(record) for f in self.fields]
+        self.errors = errors = SViewErrors(self.max_error_samples)
+        missing = self.missing
+
+        data = self._apply_stages(data)
+
+        if all(policy == 'raise' for policy in self.on_error):
+            if missing is Missing:
+                for record in data:
+                    yield [f.__calculate__(record) for f in self.fields]
+            else:
+                for record in data:
+                    yield [f.__sf_evaluate__(record, missing) for f in self.fields]
+            return
+
+        fields = list(enumerate(zip(self.fields, self.on_error)))
+        for row_index, record in enumerate(data):
+            row = []
+            for field_index, (field, policy) in fields:
+                try:
+                    row.append(field.__sf_evaluate__(record, missing))
+                except Exception as exc:
+                    if policy == 'raise':
+                        raise
+                    errors.add(row_index, field_index, exc, sample=policy == 'collect')
+                    if policy == 'skip':
+                        break
+                    row.append(self.error_value)
+            else:
+                yield row
+
+    def _count_rows(self, rows, counter):
+        """ Count rows passed through
+        """
+        for row in rows:
+            counter[0] += 1
+            yield row
+
+    def write_csv(self, data, path_or_file, header=True, batch_size=10000,
+                  executor=None, encoding='utf-8', buffer_size=1 << 20, **fmtparams):
+        """ Write rows of view to CSV (or TSV) file.
+
+            Rows are serialized in batches, and each batch is written
+            to file in single write call.
+
+            For example::
+
+                >>> buf = io.StringIO()
+                >>> view = SView(F['id'], F['name'])
+                >>> view.write_csv([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b, c'}], buf,
+                ...                header=['id', 'name'], lineterminator='\\n')
+                2
+                >>> print(buf.getvalue().strip())
+                id,name
+                1,a
+                2,"b, c"
+
+            To write TSV, pass ``delimiter='\\t'`` or ``dialect='excel-tab'``.
+
+            :param data: iterable of records
+            :param path_or_file: path to file or file-like object
+                                 (opened with ``newline=''``)
+            :param header: if True, then ``column_names`` of view are written first.
+                           Also, list of column names could be passed.
+            :param int batch_size: number of rows to serialize at once
+            :param executor: ``concurrent.futures.Executor`` to serialize
+                             batches in parallel. Order of rows is preserved.
+            :param str encoding: encoding of file (if path is passed)
+            :param int buffer_size: size of file buffer (if path is passed)
+            :param fmtparams: formatting parameters for ``csv.writer``
+            :return: number of rows written
+        """
+        counter = [0]
+        batches = _batches(self._count_rows(self(data), counter), batch_size)
+        chunks = _serialize_batches(batches, _serialize_csv, (fmtparams,), executor)
+        if header:
+            header = self.column_names if header is True else list(header)
+            chunks = itertools.chain([_serialize_csv([header], fmtparams)], chunks)
+        _write_text(path_or_file, chunks, encoding, buffer_size, newline='')
+        return counter[0]
+
+    def write_jsonl(self, data, path_or_file, keys=None, batch_size=10000,
+                    executor=None, encoding='utf-8', buffer_size=1 << 20,
+                    default=None, ensure_ascii=False):
+        """ Write rows of view to JSON Lines file.
+
+            Rows are serialized in batches, and each batch is written
+            to file in single write call.
+
+            By default each row is written as JSON array.
+            If *keys* is passed, then rows are written as JSON objects::
+
+                >>> buf = io.StringIO()
+                >>> view = SView(F['id'], F['name'])
+                >>> view.write_jsonl([{'id': 1, 'name': 'a'}], buf)
+                1
+                >>> view.write_jsonl([{'id': 2, 'name': 'b'}], buf, keys=['id', 'name'])
+                1
+                >>> print(buf.getvalue().strip())
+                [1, "a"]
+                {"id": 2, "name": "b"}
+
+            :param data: iterable of records
+            :param path_or_file: path to file or file-like object
+            :param keys: if True, then ``column_names`` of view are used as keys.
+                         Also, list of keys could be passed.
+            :param int batch_size: number of rows to serialize at once
+            :param executor: ``concurrent.futures.Executor`` to serialize
+                             batches in parallel. Order of rows is preserved.
+            :param str encoding: encoding of file (if path is passed)
+            :param int buffer_size: size of file buffer (if path is passed)
+            :param default: function to serialize objects,
+                            that are not supported by ``json``
+            :param bool ensure_ascii: escape non-ASCII characters
+            :return: number of rows written
+        """
+        if keys is True:
+            keys = self.column_names
+        elif keys is not None:
+            keys = list(keys)
+        json_params = {'default': default, 'ensure_ascii': ensure_ascii}
+        counter = [0]
+        batches = _batches(self._count_rows(self(data), counter), batch_size)
+        chunks = _serialize_batches(batches, _serialize_jsonl, (keys, json_params), executor)
+        _write_text(path_or_file, chunks, encoding, buffer_size)
+        return counter[0]
+
+    def parallel_columns(self, data, dtypes=None, processes=None, chunk_size=10000,
+                         mp_context=None):
+        """ Compute view in column-oriented form in multiple processes.
+
+            Values of fields with numeric *dtypes* are written by workers
+            directly to shared memory, and parent process wraps them
+            as typed ``memoryview`` objects without copying.
+            Only values of other fields are sent back (pickled).
+
+            For example::
+
+                >>> view = SView(F['id'], F['value'] * 1.5, F['name'])
+                >>> data = [{'id': i, 'value': i, 'name': str(i)} for i in range(5)]
+                >>> with view.parallel_columns(data, dtypes={0: 'q', 1: 'd'}, processes=2) as cols:
+                ...     print(cols[0].tolist(), cols[1].tolist(), cols[2])
+                [0, 1, 2, 3, 4] [0.0, 1.5, 3.0, 4.5, 6.0] ['0', '1', '2', '3', '4']
+
+            By default *fork* start method is used (where available),
+            thus view does not need to be picklable. With other start methods
+            view (and records) must be picklable.
+
+            ``None`` values (for example produced by *error_value* or
+            *missing*) are stored as NaN in float columns ('f', 'd').
+            Integer columns cannot store them, so such views are rejected
+            with ``ValueError``.
+
+            Errors collected by workers (see *on_error*) are merged
+            into ``errors`` attribute. Views with stages and
+            with 'skip' error policy are not supported,
+            because they do not produce exactly one row per record.
+
+            :param data: sequence of records. Other iterables are converted to list.
+            :param dtypes: mapping {field index: typecode of ``array`` module}
+                           ('q' - int64, 'd' - float64, etc)
+            :param int processes: number of worker processes
+            :param int chunk_size: number of records sent to worker at once
+            :param str mp_context: multiprocessing start method
+            :rtype: SharedColumns
+        """
+        import multiprocessing
+        from multiprocessing import shared_memory
+
+        if self.stages or 'skip' in self.on_error:
+            raise ValueError(
+                "parallel_columns requires view, that produces exactly "
+                "one row for each record (no stages and no 'skip' policy)")
+
+        dtypes = dict(dtypes or {})
+        for index, typecode in dtypes.items():
+            if typecode in _FLOAT_TYPECODES:
+                continue
+            if self.missing is None or (
+                    self.on_error[index] in ('null', 'collect') and self.error_value is None):
+                raise ValueError(
+                    "Field %d may produce None (error_value or missing), "
+                    "that cannot be stored in column of type %r. "
+                    "Use float typecode or other error_value" % (index, typecode))
+        if not isinstance(data, collections.abc.Sequence):
+            data = list(data)
+        size = len(data)
+
+        if mp_context is None and 'fork' in multiprocessing.get_all_start_methods():
+            mp_context = 'fork'
+        context = multiprocessing.get_context(mp_context)
+
+        blocks = {}
+        try:
+            for index, typecode in dtypes.items():
+                itemsize = array.array(typecode).itemsize
+                blocks[index] = shared_memory.SharedMemory(
+                    create=True, size=max(1, size * itemsize))
+
+            columns = [None] * len(self.fields)
+            for index in range(len(self.fields)):
+                if index not in dtypes:
+                    columns[index] = [None] * size
+
+            self.errors = SViewErrors(self.max_error_samples)
+            tasks = ((start, data[start:start + chunk_size])
+                     for start in range(0, size, chunk_size))
+            initargs = (self, {i: b.name for i, b in blocks.items()}, dtypes)
+            with context.Pool(processes, _init_column_worker, initargs) as pool:
+                for start, chunk, errors in pool.imap_unordered(_compute_column_chunk, tasks):
+                    for index, values in chunk.items():
+                        columns[index][start:start + len(values)] = values
+                    for field, count in errors.counts.items():
+                        self.errors.counts[field] += count
+                    for error in errors.samples:
+                        if len(self.errors.samples) < self.max_error_samples:
+                            self.errors.samples.append(error._replace(row=error.row + start))
+
+            for index, typecode in dtypes.items():
+                itemsize = array.array(typecode).itemsize
+                columns[index] = blocks[index].buf[:size * itemsize].cast(typecode)
+        except BaseException:
+            for block in blocks.values():
+                block.close()
+                block.unlink()
+            raise
+        return SharedColumns(columns, list(blocks.values()))
+
+    def partition(self, data, by, n=64, sink=None, buffer_size=1000, max_buffered=None,
+                  header=None):
+        """ Split rows of view into *n* shards by hash of key, in single pass.
+
+            Rows are buffered for each shard, and passed to *sink*
+            in batches, when buffer of shard is full, when total number
+            of buffered rows exceeds *max_buffered* (largest buffer is
+            flushed), and at the end.
+
+            Sink could be callable ``sink(shard, rows)``, or path template
+            with ``{shard}`` placeholder (see ``ShardFiles``)::
+
+                >>> shards = {}
+                >>> def sink(shard, rows):
+                ...     shards.setdefault(shard, []).extend(rows)
+                >>> data = [{'user': u, 'v': i} for i, u in enumerate('abcabca')]
+                >>> counts = SView(F['user'], F['v']).partition(
+                ...     data, by=F['user'], n=4, sink=sink)
+                >>> sum(counts)
+                7
+                >>> all(_stable_hash(user) % 4 == shard
+                ...     for shard, rows in shards.items() for user, v in rows)
+                True
+
+            Hash of key is stable between processes and runs,
+            so same key is always routed to same shard.
+            Keys could be None, strings, bytes, numbers, and tuples,
+            lists, sets or dicts of them. Other keys raise ``TypeError``.
+
+            :param data: iterable of records
+            :param by: SField instance or callable to compute key of record
+            :param int n: number of shards
+            :param sink: callable or path template
+            :param int buffer_size: max number of rows to buffer per shard
+            :param int max_buffered: max total number of buffered rows
+            :param list header: column names to write as first line of
+                                each CSV file (only if *sink* is path template)
+            :return: list with number of rows routed to each shard
+        """
+        if sink is None:
+            raise ValueError("Sink is required")
+        if isinstance(sink, str):
+            files = sink = ShardFiles(sink, header=header)
+        else:
+            files = None
+
+        # Compute key as extra first field of view, to keep it aligned
+        # with row even if some rows are skipped
+        keyed = copy.copy(self)
+        keyed.fields = [toSField(by)] + self.fields
+        keyed.on_error = ['raise'] + self.on_error
+
+        counts = [0] * n
+        buffers = [[] for __ in range(n)]
+        buffered = 0
+        try:
+            for row in keyed(data):
+                shard = _stable_hash(row[0]) % n
+                buf = buffers[shard]
+                buf.append(row[1:])
+                counts[shard] += 1
+                buffered += 1
+                if len(buf) >= buffer_size:
+                    sink(shard, buf)
+                    buffered -= len(buf)
+                    buffers[shard] = []
+                elif max_buffered is not None and buffered > max_buffered:
+                    largest = max(range(n), key=lambda i: len(buffers[i]))
+                    sink(largest, buffers[largest])
+                    buffered -= len(buffers[largest])
+                    buffers[largest] = []
+
+            for shard, buf in enumerate(buffers):
+                if buf:
+                    sink(shard, buf)
+        finally:
+            if files is not None:
+                files.close()
+            self.errors = SViewErrors(self.max_error_samples)
+            for field, count in keyed.errors.counts.items():
+                self.errors.counts[field - 1] = count
+            self.errors.samples = [
+                e._replace(field=e.field - 1) for e in keyed.errors.samples]
+        return counts
+
+    def _column_digest(self, index):
+        """ Stable digest of values of column with specified index
+        """
+        if self.stages:
+            raise ValueError("Columns of views with stages cannot be cached")
+        if 'skip' in self.on_error:
+            # Skipped rows affect all columns
+            fields = tuple(self.fields)
+            policies = tuple(self.on_error)
+        else:
+            fields = (self.fields[index],)
+            policies = (self.on_error[index],)
+        settings = (self.missing, self.error_value, policies)
+        token = _stable_token((
+            _fingerprint_value(settings),
+            tuple(f.__sf_fingerprint__() for f in fields),
+            index if len(fields) > 1 else 0))
+        return hashlib.blake2b(token.encode('utf-8', 'surrogatepass'), digest_size=16).hexdigest()
+
+    def columns(self, data, cache=None, source=None):
+        """ Compute view in column-oriented form.
+
+            If *cache* (ColumnCache instance) and *source* (path to input file)
+            are passed, then computed columns are stored in cache,
+            and later calls for same (unchanged) file load columns from cache,
+            without iterating over *data*::
+
+                >>> import json, tempfile
+                >>> tmp = tempfile.mkdtemp()
+                >>> path = tmp + '/dump.jsonl'
+                >>> with open(path, 'w') as f:
+                ...     f.writelines(json.dumps({'a': i}) + '\\n' for i in range(3))
+                >>> def read(path):
+                ...     with open(path) as f:
+                ...         for line in f:
+                ...             yield json.loads(line)
+                >>> view = SView(F['a'] * 2, F['a']._A(str))
+                >>> cache = ColumnCache(tmp + '/cache')
+                >>> numbers, strings = view.columns(read(path), cache=cache, source=path)
+                >>> numbers.tolist(), strings
+                ([0, 2, 4], ['0', '1', '2'])
+                >>> numbers, strings = view.columns(None, cache=cache, source=path)
+                >>> numbers.tolist(), strings
+                ([0, 2, 4], ['0', '1', '2'])
+                >>> import shutil; shutil.rmtree(tmp)
+
+            Columns of fields that cannot be represented in stable way
+            (see ``SField.__sf_digest__``) are not cached.
+
+            Cached columns are returned in same form, regardless of whether
+            they were just computed or loaded from cache: numeric columns
+            (all values are int64 or all are float) as typed ``memoryview``,
+            other columns as lists. Columns, that are not cached
+            (including all columns, if no cache is used), are lists.
+
+            :param data: iterable of records
+            :param ColumnCache cache: cache to store columns in
+            :param str source: path to input file, *data* is read from
+            :return: list of columns, one for each field of view
+        """
+        keys = [None] * len(self.fields)
+        columns = [None] * len(self.fields)
+        if cache is not None and source is not None:
+            for index, field in enumerate(self.fields):
+                try:
+                    keys[index] = cache.make_key(self._column_digest(index), source)
+                except ValueError:
+                    _logger.debug("Column %s (%s) cannot be cached", index, field)
+                    continue
+                columns[index] = cache.get(keys[index])
+
+        if all(column is not None for column in columns):
+            return columns
+
+        computed = [list(c) for c in zip(*self(data))] or [[] for __ in self.fields]
+        for index, key in enumerate(keys):
+            if columns[index] is None:
+                columns[index] = computed[index]
+                if key is not None:
+                    cache.put(key, computed[index])
+                    columns[index] = cache.as_cached(computed[index])
+        return columns
+
+
+class Aggregate(object):
+    """ Base class for aggregates over values of SField expression.
+
+        Aggregate itself is stateless: it describes how to create,
+        update and read aggregation state. Thus same aggregate could be
+        used to compute multiple groups, chunks, windows, etc.
+
+        Subclasses have to implement ``create``, ``add``, ``merge`` and
+        ``result`` methods. Aggregates that support removal of values
+        (required for incremental maintenance) have to set
+        ``removable`` to True and implement ``remove`` method.
+
+        :param field: SField instance or callable to compute value
+                      from record. If not set, record itself is used.
+    """
+
+    #: Could values be removed from state of this aggregate
+    removable = False
+
+    def __init__(self, field=None):
+        self.field = toSField(field) if field is not None else None
+
+    def value(self, record):
+        """ Compute value to aggregate for specified record
+        """
+        if self.field is None:
+            return record
+        return self.field.__calculate__(record)
+
+    def create(self):
+        """ Create new empty state
+        """
+        raise NotImplementedError()
+
+    def add(self, state, value):
+        """ Add value to state.
+
+            :return: updated state
+        """
+        raise NotImplementedError()
+
+    def remove(self, state, value):
+        """ Remove value, previously added to state.
+
+            :return: updated state
+        """
+        raise NotImplementedError(
+            "%s does not support removal of values" % self.__class__.__name__)
+
+    def merge(self, state, other):
+        """ Merge *other* state into *state*.
+
+            :return: merged state
+        """
+        raise NotImplementedError()
+
+    def result(self, state):
+        """ Compute result of aggregation from state
+        """
+        raise NotImplementedError()
+
+    def __repr__(self):
+        return "<%s of %s>" % (self.__class__.__name__, self.field)
+
+
+class Count(Aggregate):
+    """ Count number of records
+    """
+    removable = True
+
+    def create(self):
+        return 0
+
+    def add(self, state, value):
+        return state + 1
+
+    def remove(self, state, value):
+        return state - 1
+
+    def merge(self, state, other):
+        return state + other
+
+    def result(self, state):
+        return state
+
+
+class Sum(Aggregate):
+    """ Sum of values
+    """
+    removable = True
+
+    def create(self):
+        return 0
+
+    def add(self, state, value):
+        return state + value
+
+    def remove(self, state, value):
+        return state - value
+
+    def merge(self, state, other):
+        return state + other
+
+    def result(self, state):
+        return state
+
+
+class Mean(Aggregate):
+    """ Arithmetic mean of values. Result is None if there are no values.
+    """
+    removable = True
+
+    def create(self):
+        return [0, 0]  # sum, count
+
+    def add(self, state, value):
+        state[0] += value
+        state[1] += 1
+        return state
+
+    def remove(self, state, value):
+        state[0] -= value
+        state[1] -= 1
+        return state
+
+    def merge(self, state, other):
+        state[0] += other[0]
+        state[1] += other[1]
+        return state
+
+    def result(self, state):
+        if not state[1]:
+            return None
+        return state[0] / state[1]
+
+
+class Min(Aggregate):
+    """ Minimal value. Result is None if there are no values.
+
+        Keeps count of each distinct value, to support removal of values.
+    """
+    removable = True
+
+    def create(self):
+        return collections.Counter()
+
+    def add(self, state, value):
+        state[value] += 1
+        return state
+
+    def remove(self, state, value):
+        state[value] -= 1
+        if state[value] <= 0:
+            del state[value]
+        return state
+
+    def merge(self, state, other):
+        state.update(other)
+        return state
+
+    def result(self, state):
+        return min(state) if state else None
+
+
+class Max(Min):
+    """ Maximal value. Result is None if there are no values.
+
+        Keeps count of each distinct value, to support removal of values.
+    """
+
+    def result(self, state):
+        return max(state) if state else None
+
+
+def _stable_hash(value):
+    """ Compute 64-bit hash of value, that is stable between processes
+        and runs (in contrast to builtin ``hash`` for strings).
+
+        Equal integral numbers (like 1, 1.0 and ``Decimal(1)``)
+        produce same hash, same as for builtin ``hash``. Sets and dicts, that are equal,
+        produce same hash regardless of order of items.
+
+        Supported values are None, strings, bytes, numbers (including
+        ``Decimal`` and ``Fraction``), dates, times, datetimes, timedeltas
+        and tuples, lists, sets and dicts of them.
+
+        :raises TypeError: if value has unsupported type
+    """
+    if isinstance(value, str):
+        data = b's' + value.encode('utf-8', 'surrogatepass')
+    elif isinstance(value, bytes):
+        data = b'b' + value
+    elif value is None:
+        data = b'N'
+    elif isinstance(value, (int, float)):
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        data = b'n' + repr(int(value) if isinstance(value, bool) else value).encode()
+    elif isinstance(value, tuple):
+        data = b't' + b''.join(
+            _stable_hash(v).to_bytes(8, 'little') for v in value)
+    elif isinstance(value, list):
+        data = b'l' + b''.join(
+            _stable_hash(v).to_bytes(8, 'little') for v in value)
+    elif isinstance(value, (set, frozenset)):
+        data = b'S' + b''.join(
+            h.to_bytes(8, 'little') for h in sorted(_stable_hash(v) for v in value))
+    elif isinstance(value, dict):
+        items = sorted((_stable_hash(k), _stable_hash(v)) for k, v in value.items())
+        data = b'd' + b''.join(
+            k.to_bytes(8, 'little') + v.to_bytes(8, 'little') for k, v in items)
+    elif isinstance(value, fractions.Fraction):
+        if value.denominator == 1:
+            return _stable_hash(value.numerator)
+        data = b'Q' + str(value).encode()
+    elif isinstance(value, decimal.Decimal):
+        if value.is_finite() and value == value.to_integral_value():
+            return _stable_hash(int(value))
+        data = b'D' + str(value.normalize()).encode()
+    elif isinstance(value, datetime.datetime):
+        # Aware datetimes, that point to same moment, must be equal
+        if value.utcoffset() is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        data = b'T' + value.isoformat().encode()
+    elif isinstance(value, datetime.date):
+        data = b'a' + value.isoformat().encode()
+    elif isinstance(value, datetime.time):
+        data = b'h' + value.isoformat().encode()
+    elif isinstance(value, datetime.timedelta):
+        data = b'e' + repr((value.days, value.seconds, value.microseconds)).encode()
+    else:
+        raise TypeError(
+            "Cannot compute stable hash of value of type %r" % type(value).__name__)
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+# Tags of unhashable containers converted to hashable form
+_DICT_KEY = object()
+_LIST_KEY = object()
+_SET_KEY = object()
+
+
+def _hashable_key(value):
+    """ Convert value with unhashable containers (dicts, lists, sets)
+        to hashable value. Equal values produce equal keys.
+    """
+    if isinstance(value, collections.abc.Mapping):
+        return (_DICT_KEY, frozenset((_hashable_key(k), _hashable_key(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        key = tuple(_hashable_key(v) for v in value)
+        return key if isinstance(value, tuple) else (_LIST_KEY, key)
+    if isinstance(value, (set, frozenset)):
+        return (_SET_KEY, frozenset(_hashable_key(v) for v in value))
+    return value
+
+
+def _local_hash(value):
+    """ Compute 64-bit hash of value. Same as ``_stable_hash``, but
+        values not supported by it are hashed via builtin ``hash``,
+        thus their hashes are stable only inside current process.
+
+        :raises TypeError: if value is not hashable
+    """
+    try:
+        return _stable_hash(value)
+    except TypeError:
+        h = hash(_hashable_key(value)) & 0xffffffffffffffff
+        return int.from_bytes(hashlib.blake2b(
+            b'h' + h.to_bytes(8, 'little'), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog(object):
+    """ HyperLogLog sketch to estimate number of distinct values.
+
+        Uses ``2 ** precision`` bytes of memory.
+        Standard error of estimate is about ``1.04 / sqrt(2 ** precision)``.
+
+        Values are hashed in way, that is stable between processes,
+        so sketches built in different processes could be merged.
+        Thus values must be None, strings, bytes, numbers, dates and times,
+        or containers of them. Other values raise ``TypeError``.
+
+        :param int precision: number of bits used to select register (4..18)
+    """
+
+    def __init__(self, precision=14):
+        if not 4 <= precision <= 18:
+            raise ValueError("HyperLogLog precision must be in range 4..18")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        """ Add value to sketch
+        """
+        h = _stable_hash(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        """ Merge other sketch (with same precision) into this one
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        """ Estimate number of distinct values
+        """
+        m = len(self.registers)
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range correction (linear counting)
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def __len__(self):
+        return self.count()
+
+
+class KLLSketch(object):
+    """ KLL sketch to estimate quantiles of stream of comparable values.
+
+        Memory usage is about ``3 * k`` values.
+        Rank error is about ``1.7 / k``.
+
+        :param int k: size of top level compactor.
+        :param seed: seed of random generator, used for compactions
+    """
+
+    def __init__(self, k=200, seed=None):
+        self.k = k
+        self.count = 0
+        self.compactors = [[]]
+        self._random = random.Random(seed)
+        self._size = 0
+        self._max_size = self._capacity(0)
+
+    def _capacity(self, height):
+        depth = len(self.compactors) - height - 1
+        return int(math.ceil(self.k * (2.0 / 3.0) ** depth)) + 1
+
+    def _update_max_size(self):
+        self._max_size = sum(self._capacity(h) for h in range(len(self.compactors)))
+
+    def add(self, value):
+        """ Add value to sketch
+        """
+        self.compactors[0].append(value)
+        self.count += 1
+        self._size += 1
+        if self._size >= self._max_size:
+            self._compress()
+
+    def _compress(self):
+        while self._size >= self._max_size:
+            for height, compactor in enumerate(self.compactors):
+                if len(compactor) >= self._capacity(height):
+                    if height + 1 >= len(self.compactors):
+                        self.compactors.append([])
+                        self._update_max_size()
+                    compactor.sort()
+                    last = compactor.pop() if len(compactor) % 2 else None
+                    offset = self._random.randint(0, 1)
+                    self.compactors[height + 1].extend(compactor[offset::2])
+                    compactor[:] = [] if last is None else [last]
+                    self._size = sum(len(c) for c in self.compactors)
+                    break
+            else:
+                break
+
+    def merge(self, other):
+        """ Merge other sketch into this one
+        """
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        self._update_max_size()
+        for height, compactor in enumerate(other.compactors):
+            self.compactors[height].extend(compactor)
+        self.count += other.count
+        self._size = sum(len(c) for c in self.compactors)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        """ Estimate q-quantile (0 <= q <= 1) of values.
+            Returns None if sketch is empty.
+        """
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs):
+        """ Estimate multiple quantiles of values at once
+        """
+        weighted = sorted(
+            (value, 1 << height)
+            for height, compactor in enumerate(self.compactors)
+            for value in compactor)
+        total = sum(w for __, w in weighted)
+        result = []
+        for q in qs:
+            if not weighted:
+                result.append(None)
+                continue
+            target = q * total
+            cumulative = 0
+            for value, weight in weighted:
+                cumulative += weight
+                if cumulative >= target:
+                    break
+            result.append(value)
+        return result
+
+    def __len__(self):
+        return self.count
+
+
+class CountMinSketch(object):
+    """ Count-Min sketch to estimate frequencies of values.
+
+        Estimates never underestimate real frequency,
+        and overestimate it by at most ``e * N / width``
+        with probability ``1 - exp(-depth)`` (N - total count).
+
+        :param int width: number of counters in each row
+        :param int depth: number of rows (hash functions)
+    """
+
+    def __init__(self, width=2048, depth=5):
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.rows = [[0] * width for __ in range(depth)]
+
+    def _indexes(self, value):
+        h = _stable_hash(value)
+        h1, h2 = h & 0xffffffff, (h >> 32) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, value, count=1):
+        """ Add value to sketch
+        """
+        self.total += count
+        for row, index in zip(self.rows, self._indexes(value)):
+            row[index] += count
+
+    def estimate(self, value):
+        """ Estimate frequency of value
+        """
+        return min(row[index] for row, index in zip(self.rows, self._indexes(value)))
+
+    def merge(self, other):
+        """ Merge other sketch (with same dimensions) into this one
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge Count-Min sketches with different dimensions")
+        for row, other_row in zip(self.rows, other.rows):
+            row[:] = map(operator.add, row, other_row)
+        self.total += other.total
+        return self
+
+    def __getitem__(self, value):
+        return self.estimate(value)
+
+
+class SpaceSaving(object):
+    """ Space-Saving summary to find most frequent values (heavy hitters).
+
+        Keeps at most *capacity* counters. Any value with frequency
+        greater than ``N / capacity`` is guaranteed to be in summary.
+        Counts are overestimated by at most corresponding *error*.
+
+        :param int capacity: max number of counters to keep
+    """
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self.counters = {}  # value -> [count, error]
+        # Min-heap of [count, seq, value], one entry for each counter.
+        # Counts in heap may be outdated (lower than actual),
+        # they are refreshed lazily on eviction.
+        self._heap = []
+        self._seq = 0
+
+    def _push(self, value, count):
+        self._seq += 1
+        heapq.heappush(self._heap, [count, self._seq, value])
+
+    def _rebuild_heap(self):
+        self._heap = [[c, i, v] for i, (v, (c, __)) in enumerate(self.counters.items())]
+        self._seq = len(self._heap)
+        heapq.heapify(self._heap)
+
+    def add(self, value, count=1):
+        """ Add value to summary
+        """
+        counter = self.counters.get(value)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[value] = [count, 0]
+            self._push(value, count)
+        else:
+            # Replace value with min count. Entries with outdated
+            # counts are moved down the heap with actual counts.
+            heap = self._heap
+            while True:
+                entry = heap[0]
+                actual = self.counters[entry[2]][0]
+                if entry[0] == actual:
+                    break
+                entry[0] = actual
+                heapq.heapreplace(heap, entry)
+            min_count = self.counters.pop(entry[2])[0]
+            self.counters[value] = [min_count + count, min_count]
+            self._seq += 1
+            heapq.heapreplace(heap, [min_count + count, self._seq, value])
+
+    def _min_count(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(c for c, __ in self.counters.values())
+
+    def merge(self, other):
+        """ Merge other summary into this one
+        """
+        self_min, other_min = self._min_count(), other._min_count()
+        merged = {}
+        for value in set(self.counters) | set(other.counters):
+            count, error = self.counters.get(value, (self_min, self_min))
+            o_count, o_error = other.counters.get(value, (other_min, other_min))
+            merged[value] = [count + o_count, error + o_error]
+        top = sorted(merged.items(), key=lambda i: i[1][0], reverse=True)
+        self.counters = dict(top[:self.capacity])
+        self._rebuild_heap()
+        return self
+
+    def top(self, k=None):
+        """ Return list of (value, count) for *k* most frequent values
+        """
+        top = sorted(self.counters.items(), key=lambda i: i[1][0], reverse=True)
+        return [(value, count) for value, (count, __) in top[:k]]
+
+
+class SketchAggregate(Aggregate):
+    """ Base class for aggregates backed by sketches.
+        State of such aggregate is sketch object, that has
+        ``add`` and ``merge`` methods.
+    """
+
+    def add(self, state, value):
+        state.add(value)
+        return state
+
+    def merge(self, state, other):
+        return state.merge(other)
+
+
+class DistinctCount(SketchAggregate):
+    """ Approximate number of distinct values (via HyperLogLog)
+
+        :param field: SField instance or callable to compute value
+        :param int precision: precision of HyperLogLog sketch.
+                              Sketch uses ``2 ** precision`` bytes.
+    """
+
+    def __init__(self, field=None, precision=14):
+        super(DistinctCount, self).__init__(field)
+        self.precision = precision
+
+    def create(self):
+        return HyperLogLog(self.precision)
+
+    def result(self, state):
+        return state.count()
+
+
+class Quantiles(SketchAggregate):
+    """ Approximate quantiles of values (via KLL sketch).
+        Result is dict {quantile: value}.
+
+        :param field: SField instance or callable to compute value
+        :param quantiles: list of quantiles to compute
+        :param int k: size of KLL sketch
+        :param seed: seed of random generator of sketch
+    """
+
+    def __init__(self, field=None, quantiles=(0.5, 0.9, 0.99), k=200, seed=None):
+        super(Quantiles, self).__init__(field)
+        self.quantiles = tuple(quantiles)
+        self.k = k
+        self.seed = seed
+
+    def create(self):
+        return KLLSketch(self.k, seed=self.seed)
+
+    def result(self, state):
+        return dict(zip(self.quantiles, state.quantiles(self.quantiles)))
+
+
+class TopK(SketchAggregate):
+    """ Approximate most frequent values (via Space-Saving summary).
+        Result is list of (value, count) pairs.
+
+        :param field: SField instance or callable to compute value
+        :param int k: number of values to return
+        :param int capacity: number of counters to keep. Default is ``10 * k``
+    """
+
+    def __init__(self, field=None, k=10, capacity=None):
+        super(TopK, self).__init__(field)
+        self.k = k
+        self.capacity = capacity or 10 * k
+
+    def create(self):
+        return SpaceSaving(self.capacity)
+
+    def result(self, state):
+        return state.top(self.k)
+
+
+class Frequencies(SketchAggregate):
+    """ Approximate frequencies of values (via Count-Min sketch).
+        Result is CountMinSketch, that could be queried for frequency
+        of any value.
+
+        :param field: SField instance or callable to compute value
+        :param int width: width of Count-Min sketch
+        :param int depth: depth of Count-Min sketch
+    """
+
+    def __init__(self, field=None, width=2048, depth=5):
+        super(Frequencies, self).__init__(field)
+        self.width = width
+        self.depth = depth
+
+    def create(self):
+        return CountMinSketch(self.width, self.depth)
+
+    def result(self, state):
+        return state
+
+
+def aggregate(data, aggregates, group_by=None, finalize=True):
+    """ Compute aggregates over data in single pass.
+
+        For example::
+
+            >>> data = [{'user': u, 'latency': l} for u, l in [
+            ...     ('john', 10), ('bob', 20), ('john', 30), ('ann', 40)]]
+            >>> aggregate(data, {
+            ...     'n': Count(),
+            ...     'users': DistinctCount(F['user']),
+            ...     'top': TopK(F['user'], k=1),
+            ... })
+            {'n': 4, 'users': 3, 'top': [('john', 2)]}
+            >>> aggregate(data, {'max': Max(F['latency'])}, group_by=F['user'])
+            {'john': {'max': 30}, 'bob': {'max': 20}, 'ann': {'max': 40}}
+
+        Aggregation states (not finalized results) could be computed
+        for chunks of data (possibly in different workers),
+        and then merged via ``Aggregate.merge``.
+
+        :param data: iterable of records
+        :param dict aggregates: mapping {name: Aggregate}
+        :param group_by: SField instance or callable to compute group of record.
+                         If set, results are computed for each group.
+        :param bool finalize: if set to False, then aggregation states
+                              will be returned instead of results
+        :return: {name: result} or {group: {name: result}} if group_by is set
+    """
+    aggregates = list(aggregates.items())
+    group_fn = toFn(group_by) if group_by is not None else None
+    groups = {}
+    for record in data:
+        group = group_fn(record) if group_fn is not None else None
+        states = groups.get(group)
+        if states is None:
+            states = groups[group] = [a.create() for __, a in aggregates]
+        for index, (__, agg) in enumerate(aggregates):
+            states[index] = agg.add(states[index], agg.value(record))
+
+    if group_fn is None and None not in groups:
+        groups[None] = [a.create() for __, a in aggregates]
+
+    result = {
+        group: {
+            name: agg.result(state) if finalize else state
+            for (name, agg), state in zip(aggregates, states)
+        } for group, states in groups.items()
+    }
+    if group_fn is None:
+        return result[None]
+    return result
+
+
+#: Result of aggregation for single window (and group)
+WindowResult = collections.namedtuple('WindowResult', ('start', 'end', 'group', 'results'))
+
+
+class Window(object):
+    """ Computes aggregates over tumbling or sliding time windows
+        of stream of records.
+
+        Each record is added to all windows, that contain its timestamp
+        (``start <= ts < end``). Window is closed, and its results are emitted,
+        when watermark (max seen timestamp minus *allowed_lateness*)
+        passes end of window. Records, that arrive after all their windows
+        were closed, are dropped and counted in ``late`` attribute.
+        Remaining windows are emitted at the end of stream.
+
+        Timestamps could be numbers (then *size* and *slide* are numbers too),
+        or datetimes (then *size* and *slide* are timedeltas)::
+
+            >>> import datetime
+            >>> minute = datetime.timedelta(minutes=1)
+            >>> start = datetime.datetime(2020, 1, 1, 10, 0)
+            >>> data = [{'at': start + i * minute / 2} for i in range(5)]
+            >>> for w in Window(F['at'], size=2 * minute, slide=minute)(data):
+            ...     print(w.start.time(), w.end.time(), w.results)
+            09:59:00 10:01:00 {'count': 2}
+            10:00:00 10:02:00 {'count': 4}
+            10:01:00 10:03:00 {'count': 3}
+            10:02:00 10:04:00 {'count': 1}
+
+        :param ts: SField instance or callable to compute timestamp of record
+        :param size: size of window
+        :param slide: step between starts of windows.
+                      If not set, then tumbling windows (slide = size) are used.
+        :param dict aggregates: mapping {name: Aggregate}.
+                                By default only count of records is computed.
+        :param group_by: SField instance or callable to compute group of record.
+                         If set, results are emitted for each group of window.
+        :param allowed_lateness: how long to wait for late records
+                                 before closing windows
+        :param origin: start of first window (windows are aligned to it).
+                       Default is 0 for numbers and epoch for datetimes.
+    """
+
+    def __init__(self, ts, size, slide=None, aggregates=None, group_by=None,
+                 allowed_lateness=None, origin=None):
+        self.ts = toFn(ts)
+        self.size = size
+        self.slide = slide if slide is not None else size
+        zero = datetime.timedelta(0) if isinstance(size, datetime.timedelta) else 0
+        if not size > zero:
+            raise ValueError("Size of window must be positive")
+        if not zero < self.slide <= size:
+            raise ValueError("Slide must be positive and not greater than size")
+        self.aggregates = list((aggregates or {'count': Count()}).items())
+        self.group_by = toFn(group_by) if group_by is not None else None
+        self.allowed_lateness = allowed_lateness
+        self.origin = origin
+        self.late = 0
+
+    def _get_origin(self, ts):
+        if self.origin is not None:
+            return self.origin
+        if isinstance(ts, datetime.datetime):
+            return datetime.datetime(1970, 1, 1, tzinfo=ts.tzinfo)
+        return 0
+
+    def __call__(self, records):
+        size, slide = self.size, self.slide
+        aggregates = self.aggregates
+        open_windows = {}  # start -> {group: states}
+        starts = []  # heap of starts of open windows
+        origin = watermark = None
+        self.late = 0
+
+        def emit(start):
+            for group, states in open_windows.pop(start).items():
+                yield WindowResult(start, start + size, group, {
+                    name: agg.result(state)
+                    for (name, agg), state in zip(aggregates, states)})
+
+        for record in records:
+            ts = self.ts(record)
+            if origin is None:
+                origin = self._get_origin(ts)
+            group = self.group_by(record) if self.group_by is not None else None
+
+            # Find all windows, that contain this timestamp
+            start = origin + ((ts - origin) // slide) * slide
+            if watermark is not None and start + size <= watermark:
+                self.late += 1
+                continue
+            while start + size > ts:
+                if watermark is not None and start + size <= watermark:
+                    break  # this and earlier windows are already closed
+                groups = open_windows.get(start)
+                if groups is None:
+                    groups = open_windows[start] = {}
+                    heapq.heappush(starts, start)
+                states = groups.get(group)
+                if states is None:
+                    states = groups[group] = [agg.create() for __, agg in aggregates]
+                for index, (__, agg) in enumerate(aggregates):
+                    states[index] = agg.add(states[index], agg.value(record))
+                start -= slide
+
+            # Advance watermark and emit closed windows
+            mark = ts if self.allowed_lateness is None else ts - self.allowed_lateness
+            if watermark is None or mark > watermark:
+                watermark = mark
+            while starts and starts[0] + size <= watermark:
+                yield from emit(heapq.heappop(starts))
+
+        while starts:
+            yield from emit(heapq.heappop(starts))
+
+
+class FollowJSONL(object):
+    """ Source of records, that follows append-only JSON Lines file
+        (like ``tail -f``).
+
+        File is polled for new complete lines. Byte offset of processed
+        records is periodically saved to *checkpoint* file, so after restart
+        reading resumes from the checkpoint, instead of re-reading whole file.
+        Offset is advanced only when consumer asks for next record,
+        so records are delivered at least once.
+
+        If file is truncated or replaced (rotated), it is read from
+        the beginning.
+
+        For example::
+
+            >>> import tempfile, os
+            >>> tmp = tempfile.mkdtemp()
+            >>> path, checkpoint = tmp + '/log.jsonl', tmp + '/log.offset'
+            >>> with open(path, 'w') as f:
+            ...     __ = f.write('{"level": "info", "id": 1}\\n{"level": "error", "id": 2}\\n')
+            >>> source = FollowJSONL(path, checkpoint, where=F['level'] == 'error', follow=False)
+            >>> list(SView(F['id'])(source))
+            [[2]]
+            >>> with open(path, 'a') as f:
+            ...     __ = f.write('{"level": "error", "id": 3}\\n')
+            >>> list(SView(F['id'])(FollowJSONL(path, checkpoint, follow=False)))
+            [[3]]
+            >>> import shutil; shutil.rmtree(tmp)
+
+        :param str path: path to JSON Lines file
+        :param str checkpoint: path to file to save offset to.
+                               If not set, offset is not saved.
+        :param where: SField instance or callable to filter records
+        :param bool follow: if False, then stop at the end of file
+        :param float poll_interval: seconds to wait before checking for new data
+        :param float idle_timeout: stop, if there is no new data for
+                                   this number of seconds
+        :param int checkpoint_every: save checkpoint after this number of records
+        :param bool skip_invalid: skip lines, that are not valid JSON
+                                  (otherwise ValueError is raised)
+    """
+
+    def __init__(self, path, checkpoint=None, where=None, follow=True,
+                 poll_interval=1.0, idle_timeout=None, checkpoint_every=1000,
+                 skip_invalid=False):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.where = toFn(where) if where is not None else None
+        self.follow = follow
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.checkpoint_every = checkpoint_every
+        self.skip_invalid = skip_invalid
+        self.offset = 0
+        self.inode = None
+        self._stopped = False
+        self._load_checkpoint()
+
+    def _load_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        try:
+            with open(self.checkpoint) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return
+        self.offset = state['offset']
+        self.inode = state.get('inode')
+
+    def save_checkpoint(self):
+        """ Save current offset to checkpoint file
+        """
+        if self.checkpoint is None:
+            return
+        tmp_path = self.checkpoint + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'path': os.path.abspath(self.path),
+                       'offset': self.offset,
+                       'inode': self.inode}, f)
+        os.replace(tmp_path, self.checkpoint)
+
+    def stop(self):
+        """ Stop following file on next poll
+        """
+        self._stopped = True
+
+    def _open(self, f=None):
+        """ Open file (if it is not opened yet), and start from beginning,
+            if file was truncated or replaced since last read
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return f
+        if stat.st_ino != self.inode or stat.st_size < self.offset:
+            if self.inode is not None:
+                _logger.info("File %s was rotated or truncated, reading from start", self.path)
+            self.inode = stat.st_ino
+            self.offset = 0
+        elif f is not None:
+            return f
+
+        if f is not None:
+            f.close()
+        f = open(self.path, 'rb')
+        f.seek(self.offset)
+        return f
+
+    def __iter__(self):
+        self._stopped = False
+        f = None
+        since_checkpoint = 0
+        idle_since = time.monotonic()
+        try:
+            while f is None:
+                f = self._open()
+                if f is None:
+                    if not self.follow or self._stopped:
+                        return
+                    if (self.idle_timeout is not None and
+                            time.monotonic() - idle_since >= self.idle_timeout):
+                        return
+                    time.sleep(self.poll_interval)
+
+            while True:
+                line = f.readline()
+                if line.endswith(b'\n'):
+                    idle_since = time.monotonic()
+                    next_offset = self.offset + len(line)
+                    record = None
+                    if line.strip():
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            if not self.skip_invalid:
+                                raise ValueError(
+                                    "Invalid JSON in %s at offset %s" % (self.path, self.offset))
+                            _logger.warning(
+                                "Skipping invalid JSON in %s at offset %s", self.path, self.offset)
+                    if record is not None and (self.where is None or self.where(record)):
+                        yield record
+                    self.offset = next_offset
+                    since_checkpoint += 1
+                    if since_checkpoint >= self.checkpoint_every:
+                        self.save_checkpoint()
+                        since_checkpoint = 0
+                    continue
+
+                # End of file or incomplete line: wait for more data
+                f.seek(self.offset)
+                if since_checkpoint:
+                    self.save_checkpoint()
+                    since_checkpoint = 0
+                if not self.follow or self._stopped:
+                    return
+                if (self.idle_timeout is not None and
+                        time.monotonic() - idle_since >= self.idle_timeout):
+                    return
+                time.sleep(self.poll_interval)
+                f = self._open(f)
+        finally:
+            if f is not None:
+                f.close()
+            self.save_checkpoint()
+
+
+class MaterializedView(object):
+    """ Stores rows computed by SView for collection of records,
+        and keeps them up to date incrementally.
+
+        Rows are stored by key of record. When records change,
+        only affected rows have to be recomputed via ``upsert`` and ``delete``.
+
+        Additionally, materialized view could maintain aggregates
+        over groups of records. Aggregates are updated in O(changed),
+        thus they have to support removal of values (``Aggregate.removable``)::
+
+            >>> data = [
+            ...     {'id': 1, 'country': 'UA', 'amount': 10},
+            ...     {'id': 2, 'country': 'UA', 'amount': 5},
+            ...     {'id': 3, 'country': 'PL', 'amount': 7},
+            ... ]
+            >>> mview = MaterializedView(
+            ...     SView(F['id'], F['amount'] * 2), data,
+            ...     group_by=F['country'],
+            ...     aggregates={'n': Count(), 'total': Sum(F['amount'])})
+            >>> mview[2]
+            [2, 10]
+            >>> mview.groups['UA']
+            {'n': 2, 'total': 15}
+            >>> mview.upsert({'id': 2, 'country': 'PL', 'amount': 1})
+            [2, 2]
+            >>> mview.delete(1)
+            >>> sorted(mview.groups.items())
+            [('PL', {'n': 2, 'total': 8})]
+            >>> list(mview)
+            [[2, 2], [3, 14]]
+
+        Errors of view (see *on_error* of ``SView``) are accumulated
+        in ``errors`` attribute (``SViewErrors``) since last ``refresh``.
+        Rows of error samples are keys of records.
+        Records skipped by view do not contribute to aggregates.
+
+        :param SView view: view to compute rows
+        :param source: initial collection of records
+        :param key: SField instance or callable, that computes key of record.
+                    By default ``record['id']`` is used.
+        :param group_by: SField instance or callable, that computes group of record.
+        :param dict aggregates: mapping {name: Aggregate}
+    """
+
+    def __init__(self, view, source=(), key=None, group_by=None, aggregates=None):
+        self.view = view
+        self.key = toFn(key) if key is not None else operator.itemgetter('id')
+        self.group_by = toFn(group_by) if group_by is not None else None
+        if view.stages:
+            raise ValueError(
+                "MaterializedView does not support views with stages, "
+                "because rows are computed for each record separately")
+        self.aggregates = dict(aggregates or {})
+        for name, aggregate in self.aggregates.items():
+            if not aggregate.removable:
+                raise ValueError(
+                    "Aggregate %r (%s) does not support incremental "
+                    "maintenance" % (name, aggregate))
+
+        self.rows = {}  # key -> row
+        self._contributions = {}  # key -> (group, values of aggregates)
+        self._groups = {}  # group -> [number of records, {name: state}]
+        self.errors = SViewErrors(view.max_error_samples)
+        self.refresh(source)
+
+    def refresh(self, source):
+        """ Recompute view for whole collection of records
+        """
+        self.rows.clear()
+        self._contributions.clear()
+        self._groups.clear()
+        self.errors = SViewErrors(self.view.max_error_samples)
+        for record in source:
+            self.upsert(record)
+
+    def upsert(self, record):
+        """ Insert or update record and recompute its row
+
+            :return: computed row or None if row was skipped by view
+        """
+        key = self.key(record)
+
+        # Compute everything before changing state, thus
+        # errors do not leave view in inconsistent state
+        rows = list(self.view([record]))
+        row = rows[-1] if rows else None
+        contribution = None
+        if row is not None and self.aggregates:
+            group = self.group_by(record) if self.group_by is not None else None
+            values = {name: aggregate.value(record)
+                      for name, aggregate in self.aggregates.items()}
+            contribution = (group, values)
+            self._add_contribution(contribution)
+
+        for field, count in self.view.errors.counts.items():
+            self.errors.counts[field] += count
+        for error in self.view.errors.samples:
+            if len(self.errors.samples) < self.errors.max_samples:
+                self.errors.samples.append(error._replace(row=key))
+
+        self._retract(key)
+        if contribution is not None:
+            self._contributions[key] = contribution
+        if row is None:
+            # Record skipped by view (for example by on_error policy).
+            # Such records do not contribute to aggregates.
+            self.rows.pop(key, None)
+        else:
+            self.rows[key] = row
+        return row
+
+    def _add_contribution(self, contribution):
+        """ Add values of record to aggregates of its group.
+            If some aggregate fails, then changes are rolled back.
+        """
+        group, values = contribution
+        group_state = self._groups.get(group)
+        if group_state is None:
+            group_state = [0, {name: aggregate.create()
+                               for name, aggregate in self.aggregates.items()}]
+        states = group_state[1]
+        added = []
+        try:
+            for name, aggregate in self.aggregates.items():
+                states[name] = aggregate.add(states[name], values[name])
+                added.append((name, aggregate))
+        except Exception:
+            for name, aggregate in added:
+                states[name] = aggregate.remove(states[name], values[name])
+            raise
+        group_state[0] += 1
+        self._groups[group] = group_state
+
+    def delete(self, key):
+        """ Delete record with specified key
+
+            :raises KeyError: if there is no record with such key
+        """
+        if key not in self.rows and key not in self._contributions:
+            raise KeyError(key)
+        self._retract(key)
+        self.rows.pop(key, None)
+
+    def _retract(self, key):
+        """ Remove contribution of record with specified key from aggregates
+        """
+        contribution = self._contributions.pop(key, None)
+        if contribution is None:
+            return
+        group, values = contribution
+        group_state = self._groups[group]
+        group_state[0] -= 1
+        if group_state[0] <= 0:
+            del self._groups[group]
+            return
+        states = group_state[1]
+        for name, aggregate in self.aggregates.items():
+            states[name] = aggregate.remove(states[name], values[name])
+
+    @property
+    def groups(self):
+        """ Results of aggregates for each group: {group: {name: result}}
+        """
+        return {
+            group: {name: self.aggregates[name].result(state)
+                    for name, state in states.items()}
+            for group, (__, states) in self._groups.items()
+        }
+
+    def __getitem__(self, key):
+        return self.rows[key]
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows.values())
 
 
 # Shortcuts
@@ -637,3 +3804,10 @@ CF = CField(dummy=True)
 
 #: Shortcut for CField(dummy=True).
 C = CField(dummy=True)
+
+#: Shortcut for SField(dummy=True, missing=None).
+#: Can be used as starting point of null-safe SField expression.
+MF = SField(dummy=True, missing=None)
+
+#: Shortcut for SField(dummy=True, missing=None).
+M = SField(dummy=True, missing=None)
@@ -1,3 +1,5 @@
+import datetime
+
 import anyfield
 
 import pytest
@@ -96,3 +98,869 @@ def test_sfield_expression():
     assert ((F + 5 - 25) / 3.0).__calculate__(5) == (5 + 5 -25) / 3.0
     assert (((F + 5) - 25) / 3.0).__calculate__(5) == ((5 + 5) -25) / 3.0
     assert ((F + 5 - 25) / F).__calculate__(5) == (5 + 5 -25) / 5
+
+
+def test_sfield_null_safe():
+    M = anyfield.M
+    F = anyfield.F
+
+    data = {'user': {'login': 'john', 'tags': ['a', 'b']}, 'owner': None}
+
+    assert M['user']['login'].__calculate__(data) == 'john'
+    assert M['user']['tags'][1].__calculate__(data) == 'b'
+    assert M['user']['tags'][5].__calculate__(data) is None
+    assert M['owner']['login'].__calculate__(data) is None
+    assert M['user']['login'].upper().__calculate__(data) == 'JOHN'
+    assert M['user']['name'].upper().__calculate__(data) is None
+
+    # Nested fields inherit null-safe mode
+    expr = M['user']['login'].__q_if__(F['user']['name'], 'x')
+    assert expr.__calculate__(data) is None
+
+    # Regular expressions still raise errors
+    with pytest.raises(KeyError):
+        F['user']['name'].__calculate__(data)
+
+    view = anyfield.SView(F['user']['login'], F['user']['name'], missing='-')
+    assert list(view([data, {}])) == [['john', '-'], ['-', '-']]
+
+
+def test_sfield_null_safe_missing_handler():
+    import collections
+
+    M, F = anyfield.M, anyfield.F
+
+    # Mappings with __missing__ behave same as in regular mode
+    counts = collections.Counter(a=2)
+    assert M['x']._F(counts) == F['x']._F(counts) == 0
+    assert M['a']._F(counts) == 2
+    default = collections.defaultdict(int)
+    assert M['x']._F(default) == F['x']._F(default) == 0
+    assert M['x']['y']._F(collections.defaultdict(dict)) is None
+    assert M[['unhashable']]._F(default) is None
+
+    class Strict(dict):
+        def __missing__(self, key):
+            raise KeyError(key)
+
+    assert M['x']._F(Strict()) is None
+
+
+def test_sview_on_error():
+    F = anyfield.F
+    data = [{'a': 1}, {'a': 'x'}, {}, {'a': 3}]
+
+    view = anyfield.SView(F['a'] + 1, on_error='skip')
+    assert list(view(data)) == [[2], [4]]
+    assert view.errors.counts[0] == 2
+    assert view.errors.samples == []
+
+    view = anyfield.SView(F['a'] + 1, on_error='collect', max_error_samples=1)
+    assert list(view(data)) == [[2], [None], [None], [4]]
+    assert view.errors.total == 2
+    assert len(view.errors.samples) == 1
+    assert isinstance(view.errors.samples[0].error, TypeError)
+
+    view = anyfield.SView(F.get('a'), F['a'] + 1, on_error=['raise', 'null'],
+                          error_value='error')
+    assert list(view(data)) == [[1, 2], ['x', 'error'], [None, 'error'], [3, 4]]
+
+    view = anyfield.SView(F['a'] + 1)
+    with pytest.raises(TypeError):
+        list(view(data))
+
+    with pytest.raises(ValueError):
+        anyfield.SView(F['a'], on_error='ignore')
+    with pytest.raises(ValueError):
+        anyfield.SView(F['a'], on_error=['skip', 'skip'])
+
+
+def test_record_cache():
+    F = anyfield.F
+
+    class Record(object):
+        def __init__(self, value):
+            self.value = value
+
+    calls = []
+
+    def expensive(value):
+        calls.append(value)
+        return value * 10
+
+    cache = anyfield.RecordCache(F.value._A(expensive), maxsize=2)
+    r1, r2, r3 = Record(1), Record(2), Record(3)
+
+    assert [cache(r) for r in (r1, r2, r1)] == [10, 20, 10]
+    assert calls == [1, 2]
+    assert cache.info().hits == 1
+
+    # r2 is least recently used, so it have to be evicted
+    assert cache(r3) == 30
+    assert cache.info().evictions == 1
+    assert cache(r1) == 10
+    assert cache(r2) == 20
+    assert calls == [1, 2, 3, 2]
+
+    # Entries are removed with records
+    assert len(cache) == 2
+    del r1
+    assert len(cache) == 1
+
+    # Records, that do not support weakrefs require key
+    with pytest.raises(TypeError):
+        cache({'value': 1})
+
+
+def test_sfield_fingerprint():
+    F, C = anyfield.F, anyfield.C
+
+    def fp(expr):
+        return expr.__sf_fingerprint__()
+
+    assert fp(F['a']['b'] + 5) == fp(F['a']['b'] + 5)
+    assert fp(F['a']['b'] + 5) != fp(F['a']['b'] + 5.0)
+    assert fp(F['a'] + F['b']) != fp(F['a'] + C['b'])
+    assert fp(F['a'][:3]) == fp(F['a'][:3])
+    assert fp(F.__q_match__([(1, 'a'), (2, F['x'])])) == fp(F.__q_match__([(1, 'a'), (2, F['x'])]))
+    assert fp(anyfield.M['a']) != fp(F['a'])
+
+    cache = {fp(F['a'] * 2): 'plan'}
+    assert cache[fp(F['a'] * 2)] == 'plan'
+
+    expr = (F['a'] * F['b']).__sf_intern__()
+    assert (F['a'] * F['b']).__sf_intern__() is expr
+
+    plan = (F['a'] * F['b']).__sf_compile__()
+    assert plan is (F['a'] * F['b']).__sf_compile__()
+    assert plan({'a': 2, 'b': 3}) == 6
+
+
+def test_sfield_intern_extended_after_compile():
+    F = anyfield.F
+
+    # Extending expression after compilation must not change
+    # canonical instance and compiled plan
+    expr = F['a']
+    expr.__sf_compile__()
+    expr + 5
+    assert expr._F({'a': 1}) == 6
+    assert F['a'].__sf_intern__()._F({'a': 1}) == 1
+    assert F['a'].__sf_compile__()({'a': 1}) == 1
+
+    # Extending canonical instance creates new expression
+    canonical = (F['b'] * 2).__sf_intern__()
+    extended = canonical + 1
+    assert extended is not canonical
+    assert extended._F({'b': 2}) == 5
+    assert (F['b'] * 2).__sf_intern__()._F({'b': 2}) == 4
+
+
+def test_sfield_intern_nested_extended_after_compile():
+    F = anyfield.F
+
+    # Nested fields and containers are copied too
+    inner = F['b']
+    (F['a'] + inner).__sf_intern__()
+    (F['a'] + inner).__sf_compile__()
+    inner + 100
+    assert (F['a'] + F['b']).__sf_intern__()._F({'a': 1, 'b': 2}) == 3
+    assert (F['a'] + F['b']).__sf_compile__()({'a': 1, 'b': 2}) == 3
+
+    value = F['v']
+    conditions = [(1, value)]
+    expr = F['k'].__q_match__(conditions, default=0)
+    canonical = expr.__sf_intern__()
+    value * 10
+    conditions.append((2, 'two'))
+    assert canonical._F({'k': 1, 'v': 5}) == 5
+    assert canonical._F({'k': 2, 'v': 5}) == 0
+
+
+def test_sfield_extended_after_calculation():
+    F = anyfield.F
+    expr = F['a']
+    assert expr.__calculate__({'a': {'b': 1}}) == {'b': 1}
+
+    # Non dummy fields are extended in place, so compiled plan
+    # have to be updated
+    expr['b']
+    assert expr.__calculate__({'a': {'b': 1}}) == 1
+
+
+def test_materialized_view():
+    F = anyfield.F
+    data = [{'id': i, 'kind': i % 3, 'value': i * 10} for i in range(10)]
+
+    calls = []
+
+    def track(record):
+        calls.append(record['id'])
+        return record['id']
+
+    mview = anyfield.MaterializedView(
+        anyfield.SView(track, F['value']), data,
+        group_by=F['kind'],
+        aggregates={
+            'count': anyfield.Count(),
+            'sum': anyfield.Sum(F['value']),
+            'mean': anyfield.Mean(F['value']),
+            'min': anyfield.Min(F['value']),
+            'max': anyfield.Max(F['value']),
+        })
+    assert len(mview) == 10
+    assert mview.groups[0] == {'count': 4, 'sum': 180, 'mean': 45.0, 'min': 0, 'max': 90}
+
+    del calls[:]
+    mview.upsert({'id': 9, 'kind': 0, 'value': -5})
+    mview.upsert({'id': 10, 'kind': 1, 'value': 1000})
+    mview.delete(0)
+    assert calls == [9, 10]
+    assert mview[9] == [9, -5]
+    assert 0 not in mview
+    assert mview.groups[0] == {'count': 3, 'sum': 85, 'mean': 85 / 3, 'min': -5, 'max': 60}
+    assert mview.groups[1]['max'] == 1000
+
+    # Result must be same as for full recompute
+    data = [{'id': i, 'kind': i % 3, 'value': i * 10} for i in range(1, 9)]
+    data += [{'id': 9, 'kind': 0, 'value': -5}, {'id': 10, 'kind': 1, 'value': 1000}]
+    full = anyfield.MaterializedView(
+        mview.view, data, group_by=F['kind'], aggregates=mview.aggregates)
+    assert full.groups == mview.groups
+    assert list(full) == list(mview)
+
+    with pytest.raises(KeyError):
+        mview.delete(42)
+
+
+def test_materialized_view_errors():
+    F = anyfield.F
+    data = [{'id': 2}, {'id': 1, 'x': 1}]
+
+    # Errors of all records are accumulated
+    mview = anyfield.MaterializedView(
+        anyfield.SView(F['id'], F['x'], on_error='collect'), data)
+    assert mview.errors.total == 1
+    assert mview.errors.samples[0].row == 2
+    assert mview[2] == [2, None]
+    mview.upsert({'id': 3})
+    assert mview.errors.total == 2
+    mview.refresh(data[1:])
+    assert mview.errors.total == 0
+
+    # Skipped records do not contribute to aggregates
+    mview = anyfield.MaterializedView(
+        anyfield.SView(F['id'], F['x'], on_error='skip'), data,
+        group_by=lambda r: 'all', aggregates={'n': anyfield.Count()})
+    assert list(mview) == [[1, 1]]
+    assert mview.groups == {'all': {'n': 1}}
+    assert mview.errors.total == 1
+    mview.upsert({'id': 1})
+    assert len(mview) == 0
+    assert mview.groups == {}
+
+
+def test_materialized_view_consistent_on_errors():
+    F = anyfield.F
+    data = [{'id': i, 'x': i} for i in range(5)]
+
+    # Views with stages are not supported
+    with pytest.raises(ValueError):
+        anyfield.MaterializedView(anyfield.SView(F['id']).sample(1), data)
+
+    def value(record):
+        if record['x'] < 0:
+            raise ValueError(record['x'])
+        return record['x']
+
+    mview = anyfield.MaterializedView(
+        anyfield.SView(F['id']), data[:1], group_by=lambda r: r['id'] % 2,
+        aggregates={'n': anyfield.Count(), 'sum': anyfield.Sum(value)})
+    assert list(mview) == [[0]]
+    assert mview.groups == {0: {'n': 1, 'sum': 0}}
+
+    # Failed upsert does not change anything
+    with pytest.raises(ValueError):
+        mview.upsert({'id': 1, 'x': -1})
+    with pytest.raises(ValueError):
+        mview.upsert({'id': 0, 'x': -1})
+    assert list(mview) == [[0]]
+    assert mview.groups == {0: {'n': 1, 'sum': 0}}
+
+    # Aggregate, that fails on add, is rolled back
+    with pytest.raises(TypeError):
+        mview.upsert({'id': 0, 'x': 'text'})
+    assert list(mview) == [[0]]
+    assert mview.groups == {0: {'n': 1, 'sum': 0}}
+
+    mview.upsert({'id': 0, 'x': 5})
+    assert mview.groups == {0: {'n': 1, 'sum': 5}}
+
+
+def test_materialized_view_requires_removable_aggregates():
+    class Last(anyfield.Aggregate):
+        pass
+
+    with pytest.raises(ValueError):
+        anyfield.MaterializedView(
+            anyfield.SView(anyfield.F['id']), aggregates={'last': Last()})
+
+
+def test_sketch_aggregates():
+    F = anyfield.F
+    data = [{'user': 'user%d' % (i % 5000), 'latency': i % 1000,
+             'country': 'UA' if i % 10 else 'PL'} for i in range(20000)]
+
+    aggregates = {
+        'users': anyfield.DistinctCount(F['user'], precision=12),
+        'latency': anyfield.Quantiles(F['latency'], quantiles=(0.5, 0.9), seed=42),
+        'top': anyfield.TopK(F['country'], k=2),
+        'freq': anyfield.Frequencies(F['country'], width=64, depth=3),
+    }
+    result = anyfield.aggregate(data, aggregates)
+    assert abs(result['users'] - 5000) < 5000 * 0.05
+    assert abs(result['latency'][0.5] - 500) < 30
+    assert abs(result['latency'][0.9] - 900) < 30
+    assert result['top'] == [('UA', 18000), ('PL', 2000)]
+    assert result['freq']['PL'] >= 2000
+
+    # Sketches computed for chunks could be merged
+    first = anyfield.aggregate(data[:7000], aggregates, finalize=False)
+    second = anyfield.aggregate(data[7000:], aggregates, finalize=False)
+    merged = {name: agg.result(agg.merge(first[name], second[name]))
+              for name, agg in aggregates.items()}
+    assert abs(merged['users'] - 5000) < 5000 * 0.05
+    assert abs(merged['latency'][0.5] - 500) < 30
+    assert merged['top'] == [('UA', 18000), ('PL', 2000)]
+    assert merged['freq']['PL'] >= 2000
+
+    # Dates and decimals could be counted too
+    import datetime
+    import decimal
+    day = datetime.date(2024, 1, 1)
+    data = [{'day': day + datetime.timedelta(days=i % 30), 'price': decimal.Decimal(i % 7) / 4}
+            for i in range(1000)]
+    result = anyfield.aggregate(data, {'days': anyfield.DistinctCount(F['day']),
+                                       'prices': anyfield.DistinctCount(F['price'])})
+    assert result == {'days': 30, 'prices': 7}
+
+
+def test_space_saving():
+    import collections
+    import random
+
+    rnd = random.Random(42)
+    # Few heavy hitters in high-cardinality stream
+    stream = ['hot%d' % (i % 5) for i in range(5000)]
+    stream += ['cold%d' % rnd.randrange(10 ** 6) for __ in range(20000)]
+    rnd.shuffle(stream)
+    exact = collections.Counter(stream)
+
+    summary = anyfield.SpaceSaving(capacity=50)
+    for value in stream:
+        summary.add(value)
+    assert len(summary.counters) == 50
+    assert len(summary._heap) == 50
+    assert sorted(v for v, __ in summary.top(5)) == ['hot%d' % i for i in range(5)]
+    for value, (count, error) in summary.counters.items():
+        assert count - error <= exact[value] <= count
+
+    # Merged summaries keep working
+    other = anyfield.SpaceSaving(capacity=50)
+    for value in stream:
+        other.add(value, 2)
+    summary.merge(other)
+    for value in stream[:1000]:
+        summary.add(value)
+    assert len(summary._heap) == len(summary.counters) == 50
+    assert sorted(v for v, __ in summary.top(5)) == ['hot%d' % i for i in range(5)]
+
+
+def test_stable_hash():
+    h = anyfield._stable_hash
+    assert h('abc') == h('abc')
+    assert h('1') != h(1)
+    assert h(1) == h(1.0) == h(True)
+    assert h((1, 'a')) != h((1, 'b'))
+    assert 0 <= h('abc') < 2 ** 64
+
+    # Equal sets and dicts produce same hash regardless of order
+    assert h(frozenset(['a', 'b', 'c'])) == h({'c', 'b', 'a'})
+    assert h({'a': 1, 'b': [1, 2]}) == h({'b': [1, 2], 'a': 1})
+    assert h({'a': 1}) != h({'a': 2})
+    assert h([1, 2]) != h((1, 2))
+
+    # Dates, times and decimals are supported
+    import datetime
+    import decimal
+    import fractions
+    assert h(decimal.Decimal('2.0')) == h(2) == h(fractions.Fraction(4, 2))
+    assert h(decimal.Decimal('0.50')) == h(decimal.Decimal('0.5')) != h(decimal.Decimal('0.6'))
+    assert h(datetime.date(2024, 1, 2)) != h(datetime.date(2024, 1, 3))
+    assert h(datetime.date(2024, 1, 2)) != h('2024-01-02')
+    utc = datetime.datetime(2024, 1, 2, 10, tzinfo=datetime.timezone.utc)
+    assert h(utc) == h(utc.astimezone(datetime.timezone(datetime.timedelta(hours=3))))
+    assert h(datetime.timedelta(days=1)) == h(datetime.timedelta(hours=24))
+
+    # Unstable representations are not hashed
+    with pytest.raises(TypeError):
+        h(object())
+
+
+def test_stable_hash_between_processes():
+    import os
+    import sys
+    import subprocess
+
+    code = (
+        "import anyfield; print([anyfield._stable_hash(v) for v in "
+        "[frozenset(['x', 'y', 'z']), {'b': 1, 'a': {'z', 'q'}}, ['a', ('b', 2.0)]]])")
+    results = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed,
+                   PYTHONPATH=os.pathsep.join(sys.path))
+        results.add(subprocess.check_output([sys.executable, '-c', code], env=env))
+    assert len(results) == 1
+
+
+def test_sview_columns_cache(tmp_path):
+    F = anyfield.F
+    source = tmp_path / 'dump.txt'
+    source.write_text('1\n2\n3\n')
+
+    reads = []
+
+    def read():
+        reads.append(1)
+        for line in source.read_text().splitlines():
+            yield {'v': int(line)}
+
+    cache = anyfield.ColumnCache(str(tmp_path / 'cache'))
+    view = anyfield.SView(F['v'], F['v'] / 2, F['v'] > 1, anyfield.RecordCache(F['v'], key=F['v']))
+
+    expected = [[1, 2, 3], [0.5, 1.0, 1.5], [False, True, True], [1, 2, 3]]
+    computed = view.columns(read(), cache=cache, source=str(source))
+    assert [list(c) for c in computed] == expected
+    assert len(reads) == 1
+
+    # Last column cannot be cached, so data is read again,
+    # but numeric columns are loaded from memory-mapped files
+    columns = view.columns(read(), cache=cache, source=str(source))
+    assert [list(c) for c in columns] == expected
+    assert len(reads) == 2
+    assert isinstance(columns[0], memoryview)
+    assert isinstance(columns[1], memoryview)
+
+    # Type of columns does not depend on state of cache
+    assert [type(c) for c in computed] == [type(c) for c in columns]
+    assert [c.format for c in computed[:2]] == [c.format for c in columns[:2]]
+    assert isinstance(computed[2], list) and isinstance(computed[3], list)
+
+    view = anyfield.SView(F['v'], F['v'] / 2, F['v'] > 1)
+    assert [list(c) for c in view.columns(read(), cache=cache, source=str(source))] == expected[:3]
+    assert len(reads) == 2
+
+    # Cache is invalidated when input file is changed
+    source.write_text('1\n2\n3\n4\n')
+    assert list(view.columns(read(), cache=cache, source=str(source))[0]) == [1, 2, 3, 4]
+    assert len(reads) == 3
+
+    # Old entries are evicted
+    cache.max_size = 0
+    cache.evict()
+    assert not list((tmp_path / 'cache').iterdir())
+
+
+@pytest.mark.parametrize('memory_limit', [None, 1, 500, 10 ** 9])
+def test_sview_sort_by(memory_limit, tmp_path):
+    F = anyfield.F
+    data = [{'id': i, 'group': 'g%d' % (i * 7 % 5), 'value': i * 13 % 17} for i in range(200)]
+
+    calls = []
+
+    def key(record):
+        calls.append(record['id'])
+        return record['value']
+
+    view = anyfield.SView(F['id']).sort_by(
+        F['group'], key, descending=[True, False],
+        memory_limit=memory_limit, tmpdir=str(tmp_path))
+    view.stages[-1].merge_width = 3
+
+    expected = sorted(data, key=lambda r: r['value'])
+    expected = sorted(expected, key=lambda r: r['group'], reverse=True)
+    assert list(view(iter(data))) == [[r['id']] for r in expected]
+
+    # Each key is computed once for each record
+    assert sorted(calls) == list(range(200))
+
+    # Temporary files are removed
+    assert not list(tmp_path.iterdir())
+
+    with pytest.raises(ValueError):
+        anyfield.SView(F['id']).sort_by(F['id'], descending=[True, False])
+
+
+@pytest.mark.parametrize('memory_limit', [None, 100])
+def test_sview_sort_by_falsy_descending_key(memory_limit):
+    F, M = anyfield.F, anyfield.M
+
+    # Missing keys produce None, which has to survive spilling to disk
+    data = [{'i': i} for i in range(50)]
+    view = anyfield.SView(F['i']).sort_by(M['v'], descending=True, memory_limit=memory_limit)
+    assert list(view(data)) == [[i] for i in range(50)]
+
+    data = [{'i': i, 'v': i % 2} for i in range(50)]
+    view = anyfield.SView(F['i']).sort_by(F['v'], descending=True, memory_limit=memory_limit)
+    assert list(view(data)) == [[i] for i in range(1, 50, 2)] + [[i] for i in range(0, 50, 2)]
+
+
+def test_sview_write_csv_jsonl(tmp_path):
+    import io
+    import csv
+    import json
+    from concurrent.futures import ProcessPoolExecutor
+
+    F = anyfield.F
+    data = [{'id': i, 'name': 'name %d' % i, 'tags': ['a', 'b'][:i % 3]} for i in range(1000)]
+    view = anyfield.SView(F['id'], F['name'], F['tags'])
+
+    path = tmp_path / 'out.tsv'
+    assert view.write_csv(data, str(path), header=['id', 'name', 'tags'],
+                          batch_size=64, delimiter='\t') == 1000
+    with open(str(path), newline='') as f:
+        rows = list(csv.reader(f, delimiter='\t'))
+    assert rows[0] == ['id', 'name', 'tags']
+    assert rows[1:] == [[str(r['id']), r['name'], str(r['tags'])] for r in data]
+
+    path = tmp_path / 'out.jsonl'
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert view.write_jsonl(data, path, keys=['id', 'name', 'tags'],
+                                batch_size=100, executor=executor) == 1000
+    with open(str(path)) as f:
+        assert [json.loads(line) for line in f] == data
+
+    path = tmp_path / 'empty.csv'
+    assert view.write_csv([], path, header=False) == 0
+    assert path.read_text() == ''
+
+    # By default column names are derived from fields
+    view = anyfield.SView(F['id'], F['name'].upper(), anyfield.SField('tags_name')['tags'])
+    buf = io.StringIO()
+    view.write_csv(data[:1], buf, lineterminator='\n')
+    assert buf.getvalue().splitlines()[0] == 'id,field2,tags_name'
+    buf = io.StringIO()
+    view.write_jsonl(data[:1], buf, keys=True)
+    assert json.loads(buf.getvalue()) == {'id': 0, 'field2': 'NAME 0', 'tags_name': []}
+
+
+def test_sview_parallel_columns():
+    F = anyfield.F
+    data = [{'id': i, 'value': i / 4, 'name': 'n%d' % i} for i in range(1000)]
+    data[10]['value'] = None
+
+    # View uses lambdas, thus it is not picklable
+    view = anyfield.SView(F['id'], F['value'] * 2, F['name'].upper(), lambda r: r['id'] % 3,
+                          on_error='collect', error_value=-1.0)
+    with view.parallel_columns(data, dtypes={0: 'q', 1: 'd'}, processes=2, chunk_size=64) as cols:
+        assert isinstance(cols[0], memoryview)
+        assert cols[0].tolist() == list(range(1000))
+        assert cols[1].tolist() == [-1.0 if i == 10 else i / 2 for i in range(1000)]
+        assert cols[2] == ['N%d' % i for i in range(1000)]
+        assert cols[3] == [i % 3 for i in range(1000)]
+    assert view.errors.counts[1] == 1
+    assert view.errors.samples[0].row == 10
+
+    with pytest.raises(ValueError):
+        anyfield.SView(F['id'], on_error='skip').parallel_columns(data)
+
+
+def test_sview_parallel_columns_default_error_value():
+    import math
+
+    F, M = anyfield.F, anyfield.M
+    data = [{'id': i, 'value': i} for i in range(100)]
+    data[7]['value'] = None
+    del data[8]['value']
+
+    # None is stored as NaN in float columns
+    view = anyfield.SView(F['id'], F['value'] * 2, M['value'], on_error='collect')
+    with view.parallel_columns(data, dtypes={1: 'd', 2: 'd'}, processes=2, chunk_size=16) as cols:
+        assert math.isnan(cols[1][7]) and math.isnan(cols[1][8])
+        assert math.isnan(cols[2][8])
+        assert cols[1][9] == 18.0
+    assert view.errors.counts[1] == 2
+
+    # Integer columns cannot store None
+    with pytest.raises(ValueError):
+        view.parallel_columns(data, dtypes={1: 'q'})
+    with pytest.raises(ValueError):
+        anyfield.SView(F['id'], missing=None).parallel_columns(data, dtypes={0: 'q'})
+    with pytest.raises(ValueError):
+        anyfield.SView(F['id'], M['value']).parallel_columns(data, dtypes={1: 'q'}, processes=2)
+
+
+@pytest.mark.parametrize('mode', ['exact', 'bloom'])
+def test_sview_distinct(mode):
+    F = anyfield.F
+    data = [{'id': i % 3000, 'n': i} for i in range(9000)]
+
+    view = anyfield.SView(F['n']).distinct(key=F['id'], mode=mode, capacity=500, error_rate=0.01)
+    rows = list(view(iter(data)))
+    if mode == 'exact':
+        assert rows == [[i] for i in range(3000)]
+    else:
+        # Bloom filter may drop some unique records, but never keeps duplicates
+        assert 3000 * 0.97 <= len(rows) <= 3000
+        assert all(n < 3000 for n, in rows)
+
+    with pytest.raises(ValueError):
+        anyfield.SView(F['n']).distinct(mode='approx')
+
+
+@pytest.mark.parametrize('mode', ['exact', 'bloom'])
+def test_sview_distinct_any_keys(mode):
+    import datetime
+    import decimal
+
+    F = anyfield.F
+
+    class Record(object):
+        def __init__(self, n):
+            self.n = n
+
+    # Records without stable hash are compared by builtin hash and equality
+    records = [Record(1), Record(2)]
+    assert len(list(anyfield.SView(F.n).distinct(mode=mode)(records + records))) == 2
+
+    day = datetime.date(2024, 1, 1)
+    data = [{'created_at': day + datetime.timedelta(days=i % 3),
+             'price': decimal.Decimal(i % 2), 'tags': {'a': [i % 4]}} for i in range(12)]
+    for key, expected in [(F['created_at'], 3), (F['price'], 2), (F['tags'], 4), (None, 12)]:
+        view = anyfield.SView(F['created_at']).distinct(key=key, mode=mode)
+        assert len(list(view(data))) == expected
+    view = anyfield.SView(F['created_at']).distinct(key=lambda r: [r['tags'], Record], mode=mode)
+    assert len(list(view(data))) == 4
+
+
+def test_bloom_filter():
+    bloom = anyfield.ScalableBloomFilter(capacity=100, error_rate=0.01)
+    assert sum(bloom.add('value %d' % i) for i in range(0, 2000, 2)) > 1000 * 0.98
+    assert not any(bloom.add('value %d' % i) for i in range(0, 2000, 2))
+    assert len(bloom.filters) > 1
+    false_positives = sum('value %d' % i in bloom for i in range(1, 2000, 2))
+    assert false_positives < 1000 * 0.02
+
+
+@pytest.mark.parametrize('capacity', [10, 100])
+def test_scalable_bloom_filter_false_positive_rate(capacity):
+    bloom = anyfield.ScalableBloomFilter(capacity=capacity, error_rate=0.001)
+    for i in range(10000):
+        bloom.add('key %d' % i)
+    assert all('key %d' % i in bloom for i in range(10000))
+    false_positives = sum('other %d' % i in bloom for i in range(30000))
+    assert false_positives / 30000 < 0.001
+
+
+def test_sview_window():
+    F = anyfield.F
+    consumed = []
+
+    def stream():
+        for ts, user in [(1, 'a'), (3, 'b'), (4, 'a'), (2, 'a'), (7, 'b'), (1, 'c'), (12, 'a')]:
+            consumed.append(ts)
+            yield {'ts': ts, 'user': user}
+
+    windows = anyfield.SView().distinct(key=F['ts']).window(
+        F['ts'], size=4, slide=2, group_by=F['user'], allowed_lateness=1,
+        aggregates={'n': anyfield.Count(), 'users': anyfield.DistinctCount(F['user'])})
+    results = windows(stream())
+
+    # Results are emitted as soon as watermark passes window end
+    first = next(results)
+    assert first == anyfield.WindowResult(-2, 2, 'a', {'n': 1, 'users': 1})
+    assert consumed == [1, 3]
+
+    # Record with ts=2 is not late, because of allowed lateness.
+    # Duplicate record (1, 'c') is removed by distinct
+    rest = [(w.start, w.group, w.results['n']) for w in results]
+    assert rest == [
+        (0, 'a', 2), (0, 'b', 1),
+        (2, 'b', 1), (2, 'a', 2),
+        (4, 'a', 1), (4, 'b', 1),
+        (6, 'b', 1),
+        (10, 'a', 1), (12, 'a', 1),
+    ]
+
+
+def test_window_late_records():
+    F = anyfield.F
+    window = anyfield.Window(F, size=10)
+    results = list(window([1, 15, 25, 3, 31]))
+    assert [(w.start, w.results['count']) for w in results] == [(0, 1), (10, 1), (20, 1), (30, 1)]
+    assert window.late == 1
+
+    with pytest.raises(ValueError):
+        anyfield.Window(F, size=10, slide=20)
+
+
+@pytest.mark.parametrize('size, slide', [
+    (10, -5), (10, 0), (0, None), (-10, None), (-10, -20),
+    (datetime.timedelta(minutes=1), -datetime.timedelta(seconds=1)),
+    (datetime.timedelta(minutes=1), datetime.timedelta(0)),
+    (-datetime.timedelta(minutes=1), None),
+])
+def test_window_invalid_size_slide(size, slide):
+    with pytest.raises(ValueError):
+        anyfield.Window(anyfield.F, size=size, slide=slide)
+
+
+def test_follow_jsonl(tmp_path):
+    import json
+    import threading
+
+    F = anyfield.F
+    path = tmp_path / 'log.jsonl'
+    checkpoint = str(tmp_path / 'log.offset')
+
+    def append(*records, tail=''):
+        with open(str(path), 'a') as f:
+            f.write(''.join(json.dumps(r) + '\n' for r in records) + tail)
+
+    append({'id': 1}, {'id': 2}, tail='{"id"')
+
+    # Incomplete last line is not read, until it is finished
+    source = anyfield.FollowJSONL(str(path), checkpoint, poll_interval=0.01,
+                                  idle_timeout=0.5, checkpoint_every=1)
+    writer = threading.Timer(0.1, append, args=({'id': 4},), kwargs={'tail': ''})
+    with open(str(path), 'a') as f:
+        f.write(': 3}\n')
+    writer.start()
+    assert [r['id'] for r in source] == [1, 2, 3, 4]
+    writer.join()
+
+    # Resume from checkpoint
+    append({'id': 5}, {'id': 6})
+    source = anyfield.FollowJSONL(str(path), checkpoint, follow=False)
+    for record in source:
+        assert record['id'] == 5
+        break  # Consumer stopped before processing next record
+
+    source = anyfield.FollowJSONL(str(path), checkpoint, where=F['id'] % 2 == 0, follow=False)
+    assert list(anyfield.SView(F['id'])(source)) == [[6]]
+
+    # Truncated file is read from start
+    path.write_text('{"id": 7}\n')
+    assert [r['id'] for r in anyfield.FollowJSONL(str(path), checkpoint, follow=False)] == [7]
+
+    path.write_text('{"id": 8}\nnot json\n{"id": 9}\n')
+    with pytest.raises(ValueError):
+        list(anyfield.FollowJSONL(str(path), follow=False))
+    source = anyfield.FollowJSONL(str(path), follow=False, skip_invalid=True)
+    assert [r['id'] for r in source] == [8, 9]
+
+
+def test_sview_sample():
+    F = anyfield.F
+    data = [{'id': i, 'group': i % 4} for i in range(10000)]
+
+    view = anyfield.SView(F['id']).sample(100, seed=1)
+    rows = list(view(iter(data)))
+    assert len(rows) == 100
+    assert rows == sorted(rows)  # original order is kept
+    assert rows == list(view(iter(data)))  # reproducible
+    assert rows != list(anyfield.SView(F['id']).sample(100, seed=2)(data))
+
+    # Sample is roughly uniform
+    assert 2500 < sum(r[0] for r in rows) / len(rows) < 7500
+
+    view = anyfield.SView(F['group']).sample(10, by=F['group'], seed=1)
+    rows = list(view(data))
+    assert sorted(rows) == [[g] for g in range(4) for __ in range(10)]
+
+    # Small streams are returned completely
+    assert list(anyfield.SView(F['id']).sample(100)(data[:5])) == [[i] for i in range(5)]
+
+    # Each record is selected with same probability
+    counts = [0] * 10
+    for seed in range(2000):
+        for record in anyfield.Sample(3, seed=seed)(range(10)):
+            counts[record] += 1
+    assert all(500 < c < 700 for c in counts)
+
+
+def test_sview_partition(tmp_path):
+    import csv
+
+    F = anyfield.F
+    data = [{'user': 'user%d' % (i % 37), 'v': i} for i in range(1000)]
+    data[5]['v'] = None
+    view = anyfield.SView(F['user'], F['v'] + 1, on_error='skip')
+
+    flushes = []
+    shards = {}
+
+    def sink(shard, rows):
+        flushes.append(len(rows))
+        shards.setdefault(shard, []).extend(rows)
+
+    counts = view.partition(data, by=F['user'], n=8, sink=sink, buffer_size=20, max_buffered=50)
+    assert sum(counts) == 999
+    assert max(flushes) <= 20
+    assert view.errors.counts[1] == 1
+
+    # Each key goes to single shard, and order of rows is kept
+    owners = {}
+    for shard, rows in shards.items():
+        assert len(rows) == counts[shard]
+        for user, v in rows:
+            assert owners.setdefault(user, shard) == shard
+        assert [v for __, v in rows] == sorted(v for __, v in rows)
+
+    # Rows could be written to files
+    template = str(tmp_path / 'out' / 'part-{shard:02d}.csv')
+    counts = view.partition(data, by=F['user'], n=4, sink=template, header=['user', 'v'])
+    for shard in range(4):
+        with open(template.format(shard=shard), newline='') as f:
+            rows = list(csv.reader(f))
+        assert len(rows) == counts[shard] + 1
+        assert rows[0] == ['user', 'v']
+
+    # No header is written by default
+    counts = view.partition(data, by=F['user'], n=4, sink=template)
+    with open(template.format(shard=0), newline='') as f:
+        assert len(list(csv.reader(f))) == counts[0]
+
+
+def test_sview_partition_key_types():
+    import os
+    import sys
+    import subprocess
+
+    # Shards of keys of different types must be same in different runs
+    code = (
+        "import anyfield\n"
+        "keys = [1, 2.0, 'a', None, (1, 'b'), ['x', 'y'], frozenset('abc'),\n"
+        "        {'k': {1, 2}, 'j': 'v'}, b'raw']\n"
+        "shards = {}\n"
+        "sink = lambda shard, rows: shards.update((r[0], shard) for r in rows)\n"
+        "anyfield.SView(anyfield.F['i']).partition(\n"
+        "    [{'i': i, 'k': k} for i, k in enumerate(keys)],\n"
+        "    by=anyfield.F['k'], n=64, sink=sink)\n"
+        "print(sorted(shards.items()))\n")
+    results = set()
+    for seed in ('1', '2', '3'):
+        env = dict(os.environ, PYTHONHASHSEED=seed,
+                   PYTHONPATH=os.pathsep.join(sys.path))
+        results.add(subprocess.check_output([sys.executable, '-c', code], env=env))
+    assert len(results) == 1
+
+    # Equal keys go to same shard, and unsupported keys are rejected
+    F = anyfield.F
+    shards = {}
+    data = [{'i': 0, 'k': {'a': 1, 'b': 2}}, {'i': 1, 'k': {'b': 2, 'a': 1}}]
+    anyfield.SView(F['i']).partition(
+        data, by=F['k'], n=64, sink=lambda shard, rows: shards.update((r[0], shard) for r in rows))
+    assert shards[0] == shards[1]
+    with pytest.raises(TypeError):
+        anyfield.SView(F['i']).partition([{'i': 0}], by=lambda r: object(), sink=print)